@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Post, Comment, Tag
+from .models import Post, Comment, Tag, OutboxEmail, JobRun, MediaBlob
 
 
 
@@ -20,3 +20,23 @@ class CommentAdmin(admin.ModelAdmin):
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     list_display = ("name",)
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ("to", "subject", "status", "attempts", "next_attempt_at", "sent_at")
+    list_filter = ("status",)
+    search_fields = ("to", "subject")
+
+
+@admin.register(JobRun)
+class JobRunAdmin(admin.ModelAdmin):
+    list_display = ("job", "status", "started_at", "duration", "overran", "runner")
+    list_filter = ("job", "status", "overran")
+
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ("name", "size", "refcount", "touched_at")
+    search_fields = ("name",)
+    readonly_fields = ("name", "size", "refcount", "touched_at")
@@ -7,5 +7,4 @@ class BlogConfig(AppConfig):
     name = 'blog'
 
     def ready(self):
-        from .scheduler import start
-        start()
\ No newline at end of file
+        from . import signals  # noqa: F401
@@ -0,0 +1,134 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import invalidate
+from .counters import refresh_tag_counters, refresh_author_stats
+from .feed import fan_out, push_to_tag_followers
+from .models import Post, Tag
+from .search import update_search_vectors
+from .serializers import PostBulkItemSerializer
+
+
+
+# keeps a through-table INSERT under PostgreSQL's 65535 bind parameters
+THROUGH_BATCH_SIZE = 30000
+
+
+def max_bulk_items():
+    return getattr(settings, "POST_BULK_MAX_ITEMS", 1000)
+
+
+def _validate(items, partial):
+    """Per-item validation without queries, then one query for every referenced tag.
+
+    Returns ``(results, valid)``: ``results`` holds an error entry for each rejected index and
+    ``valid`` the ``(index, validated_data)`` pairs to write.
+    """
+    results = {}
+    valid = []
+    for index, item in enumerate(items):
+        serializer = PostBulkItemSerializer(data=item, partial=partial)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = {"index": index, "status": "error", "errors": serializer.errors}
+
+    requested = {tag_id for _, data in valid for tag_id in data.get("tag_ids", ())}
+    known = set(Tag.objects.filter(pk__in=requested).values_list("pk", flat=True)) if requested else set()
+
+    checked = []
+    for index, data in valid:
+        unknown = sorted(set(data.get("tag_ids", ())) - known)
+        if unknown:
+            results[index] = {"index": index, "status": "error", "errors": {"tag_ids": [f"Unknown tag ids: {unknown}"]}}
+        else:
+            checked.append((index, data))
+    return results, checked
+
+
+def _insert_tag_links(post_tags):
+    PostTag = Post.tags.through
+    PostTag.objects.bulk_create(
+        [PostTag(post_id=post_id, tag_id=tag_id) for post_id, tag_ids in post_tags for tag_id in set(tag_ids)],
+        batch_size=THROUGH_BATCH_SIZE,
+    )
+
+
+def _ordered(results, count):
+    return [results[index] for index in range(count)]
+
+
+def bulk_create_posts(items, author):
+    """Create many posts with a fixed number of queries, whatever the batch size."""
+    results, valid = _validate(items, partial=False)
+    if valid:
+        with transaction.atomic():
+            posts = Post.objects.bulk_create([
+                Post(author=author, title=data["title"], content=data["content"]) for _, data in valid
+            ])
+            _insert_tag_links((post.pk, data.get("tag_ids", ())) for post, (_, data) in zip(posts, valid))
+
+            # bulk_create skips the signals that maintain the derived data
+            post_ids = [post.pk for post in posts]
+            tag_ids = {tag_id for _, data in valid for tag_id in data.get("tag_ids", ())}
+            if tag_ids:
+                refresh_tag_counters(tag_ids)
+            if author is not None:
+                refresh_author_stats([author.pk])
+            update_search_vectors(post_ids)
+            fan_out(post_ids)
+        invalidate("posts")
+
+        for post, (index, _) in zip(posts, valid):
+            results[index] = {"index": index, "status": "created", "id": post.pk}
+    return _ordered(results, len(items))
+
+
+def bulk_update_posts(items, author):
+    """Update many of ``author``'s posts; items carry an ``id`` and any of title, content, tag_ids."""
+    results, valid = _validate(items, partial=True)
+    # which of two edits of one post should win is not ours to guess, both are rejected
+    repeated = {post_id for post_id, count in Counter(data.get("id") for _, data in valid).items() if count > 1}
+    for index, data in valid:
+        if data.get("id") in repeated:
+            results[index] = {"index": index, "status": "error", "errors": {"id": ["Duplicate id in batch."]}}
+    valid = [(index, data) for index, data in valid if data.get("id") not in repeated]
+    ids = [data.get("id") for _, data in valid]
+    posts = Post.objects.filter(author=author).in_bulk([post_id for post_id in ids if post_id is not None])
+
+    updates = []
+    for index, data in valid:
+        post = posts.get(data.get("id"))
+        if post is None:
+            results[index] = {"index": index, "status": "error", "errors": {"id": ["Post not found."]}}
+            continue
+        for field in ("title", "content"):
+            if field in data:
+                setattr(post, field, data[field])
+        post.updated_at = timezone.now()
+        updates.append((index, post, data))
+
+    if updates:
+        retagged = [(post.pk, data["tag_ids"]) for _, post, data in updates if "tag_ids" in data]
+        PostTag = Post.tags.through
+        with transaction.atomic():
+            Post.objects.bulk_update([post for _, post, _ in updates], ["title", "content", "updated_at"])
+
+            tag_ids = {tag_id for _, tag_ids in retagged for tag_id in tag_ids}
+            if retagged:
+                links = PostTag.objects.filter(post_id__in=[post_id for post_id, _ in retagged])
+                tag_ids.update(links.values_list("tag_id", flat=True))
+                links.delete()
+                _insert_tag_links(retagged)
+                push_to_tag_followers([post_id for post_id, _ in retagged])
+            if tag_ids:
+                refresh_tag_counters(tag_ids)
+            update_search_vectors([post.pk for _, post, _ in updates])
+        invalidate("posts", *(f"post:{post.pk}" for _, post, _ in updates))
+
+        for index, post, _ in updates:
+            results[index] = {"index": index, "status": "updated", "id": post.pk}
+    return _ordered(results, len(items))
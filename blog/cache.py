@@ -0,0 +1,111 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rest_framework.response import Response
+
+
+
+def response_cache():
+    return caches[getattr(settings, "RESPONSE_CACHE_ALIAS", "default")]
+
+
+def _tag_key(tag):
+    return f"resp-tag:{tag}"
+
+
+def tag_versions(tags, initial=None):
+    """Current version of every tag, giving tags that have none yet ``initial`` or a fresh version."""
+    cache = response_cache()
+    keys = {_tag_key(tag): tag for tag in tags}
+    versions = cache.get_many(keys)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        for key in missing:
+            cache.add(key, initial if initial is not None else time.time_ns(), timeout=None)
+        versions.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def invalidate(*tags):
+    """Expire every cached response built from one of ``tags`` by giving the tags a new version."""
+    if tags:
+        version = time.time_ns()
+        response_cache().set_many({_tag_key(tag): version for tag in tags}, timeout=None)
+
+
+def _is_fresh(entry_tags):
+    if not entry_tags:
+        return True
+    current = response_cache().get_many([_tag_key(tag) for tag in entry_tags])
+    return all(current.get(_tag_key(tag)) == version for tag, version in entry_tags.items())
+
+
+class CachedListMixin:
+    """Caches list responses in the shared response cache, invalidated per object instead of by TTL.
+
+    The key is the view, the auth scope and the normalized query string. Each entry records the
+    version of the tags it was built from: the ``posts`` collection plus ``post:<id>``,
+    ``author:<id>`` and ``tag:<id>`` for every object on the page. blog.signals bumps those tags
+    on writes, so only the affected entries are dropped. Only ``list`` (GET/HEAD) is cached.
+    """
+    cache_timeout = getattr(settings, "RESPONSE_CACHE_TIMEOUT", 300)
+    cache_collection_tags = ("posts",)
+    cache_per_user = False
+
+    def get_cache_scope(self, request):
+        if not request.user or not request.user.is_authenticated:
+            return "anon"
+        return f"user:{request.user.pk}" if self.cache_per_user else "auth"
+
+    def get_response_cache_key(self, request):
+        params = sorted(
+            (key, value)
+            for key, values in request.query_params.lists()
+            for value in values
+            if value != ""
+        )
+        digest = hashlib.sha256(urlencode(params).encode("utf-8")).hexdigest()
+        view = f"{self.__class__.__module__}.{self.__class__.__name__}"
+        return f"resp:{view}:{self.get_cache_scope(request)}:{digest}"
+
+    def get_cache_tags(self, objects):
+        tags = set()
+        for post in objects:
+            tags.add(f"post:{post.pk}")
+            if post.author_id:
+                tags.add(f"author:{post.author_id}")
+            tags.update(f"tag:{tag.pk}" for tag in post.tags.all())
+        return tags
+
+    def list(self, request, *args, **kwargs):
+        cache = response_cache()
+        key = self.get_response_cache_key(request)
+        entry = cache.get(key)
+        if entry is not None and _is_fresh(entry["tags"]):
+            return Response(entry["data"], headers={"X-Cache": "HIT"})
+
+        # read before querying, so a write racing with this request leaves the entry stale-marked
+        tags = tag_versions(self.cache_collection_tags)
+        started = time.time_ns()
+
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        objects = page if page is not None else list(queryset)
+        serializer = self.get_serializer(objects, many=True)
+        if page is not None:
+            response = self.get_paginated_response(serializer.data)
+        else:
+            response = Response(serializer.data)
+
+        # the objects' tags are only known after the query: one written since may be on the page
+        # stale under its new version, that page is served but not stored
+        object_tags = tag_versions(self.get_cache_tags(objects), initial=started)
+        if all(version <= started for version in object_tags.values()):
+            tags.update(object_tags)
+            cache.set(key, {"data": response.data, "tags": tags}, self.cache_timeout)
+        response["X-Cache"] = "MISS"
+        return response
@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest, Now
+
+from .models import Post, Comment, Tag, AuthorStats
+
+
+
+def _count_subquery(queryset, field):
+    """COUNT(*) of ``queryset`` grouped by ``field``, usable inside an UPDATE."""
+    return Coalesce(
+        Subquery(queryset.order_by().values(field).annotate(total=Count("pk")).values("total")[:1]),
+        0,
+    )
+
+
+def _latest_comment_subquery():
+    return Subquery(
+        Comment.objects.filter(post=OuterRef("pk")).order_by("-created_at", "-pk").values("pk")[:1]
+    )
+
+
+def refresh_post_counters(post_ids=None):
+    """Recompute comment_count, like_count and latest_comment in one UPDATE.
+
+    Used to repair drift and after bulk inserts that bypass signals. ``None`` means every post.
+    """
+    posts = Post.objects.all() if post_ids is None else Post.objects.filter(pk__in=post_ids)
+    return posts.update(
+        comment_count=_count_subquery(Comment.objects.filter(post=OuterRef("pk")), "post"),
+        like_count=_count_subquery(Post.likes.through.objects.filter(post=OuterRef("pk")), "post"),
+        latest_comment=_latest_comment_subquery(),
+    )
+
+
+def refresh_tag_counters(tag_ids=None):
+    """Recompute Tag.post_count of live posts in one UPDATE. ``None`` means every tag."""
+    tags = Tag.objects.all() if tag_ids is None else Tag.objects.filter(pk__in=tag_ids)
+    live = Post.tags.through.objects.filter(tag=OuterRef("pk"), post__deleted_at__isnull=True)
+    return tags.update(post_count=_count_subquery(live, "tag"))
+
+
+def refresh_like_counts(post_ids):
+    return Post.objects.filter(pk__in=post_ids).update(
+        like_count=_count_subquery(Post.likes.through.objects.filter(post=OuterRef("pk")), "post"),
+        activity_at=Now(),
+    )
+
+
+def touch_posts(post_ids):
+    """Mark posts as changed without a save(), e.g. when their tags change."""
+    return Post.objects.filter(pk__in=post_ids).update(activity_at=Now())
+
+
+def record_comment_added(comment):
+    Post.objects.filter(pk=comment.post_id).update(
+        comment_count=F("comment_count") + 1,
+        latest_comment=comment.pk,
+        activity_at=Now(),
+    )
+
+
+def record_comment_removed(comment):
+    # latest_comment is SET_NULL by the delete collector, so only refill it when it was cleared
+    Post.objects.filter(pk=comment.post_id).update(
+        comment_count=Greatest(F("comment_count") - 1, 0),
+        latest_comment=Coalesce(F("latest_comment"), _latest_comment_subquery()),
+        activity_at=Now(),
+    )
+
+
+def refresh_author_stats(author_ids=None):
+    """Rebuild AuthorStats rows (creating missing ones) with one INSERT and one UPDATE."""
+    posts = Post.objects.exclude(author=None).order_by()
+    stats = AuthorStats.objects.all()
+    if author_ids is not None:
+        posts = posts.filter(author_id__in=author_ids)
+        stats = stats.filter(pk__in=author_ids)
+
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(author_id=author_id) for author_id in posts.values_list("author_id", flat=True).distinct()],
+        ignore_conflicts=True,
+    )
+    return stats.update(post_count=_count_subquery(Post.objects.filter(author=OuterRef("pk")), "author"))
+
+
+def record_post_authored(author_id, delta):
+    if author_id is None:
+        return
+    if delta > 0:
+        AuthorStats.objects.bulk_create([AuthorStats(author_id=author_id)], ignore_conflicts=True)
+    AuthorStats.objects.filter(pk=author_id).update(post_count=Greatest(F("post_count") + delta, 0))
+
+
+def refresh_follower_counts(author_ids):
+    """Recompute AuthorStats.follower_count of ``author_ids``, creating missing rows."""
+    AuthorStats.objects.bulk_create([AuthorStats(author_id=author_id) for author_id in author_ids], ignore_conflicts=True)
+    following = get_user_model().following.through.objects.filter(to_user=OuterRef("pk"))
+    return AuthorStats.objects.filter(pk__in=author_ids).update(follower_count=_count_subquery(following, "to_user"))
+
+
+def refresh_tag_follower_counts(tag_ids):
+    followers = Tag.followers.through.objects.filter(tag=OuterRef("pk"))
+    return Tag.objects.filter(pk__in=tag_ids).update(follower_count=_count_subquery(followers, "tag"))
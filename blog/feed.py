@@ -0,0 +1,160 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import Post, Tag, AuthorStats, FeedEntry
+
+
+
+# pulls reach back this far before the watermark, for posts committed after it with an older created_at
+PULL_OVERLAP = timedelta(minutes=1)
+
+
+def fanout_max_followers():
+    """Authors and tags with more followers are not fanned out on write, their followers pull them on read."""
+    return getattr(settings, "FEED_FANOUT_MAX_FOLLOWERS", 5000)
+
+
+def feed_retention():
+    return timedelta(days=getattr(settings, "FEED_RETENTION_DAYS", 30))
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def _insert_entries(select, params):
+    """INSERT the ``(user_id, post_id, created_at)`` rows of ``select`` into the timelines, skipping existing ones."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {_table(FeedEntry)} (user_id, post_id, created_at) {select} "
+            "ON CONFLICT (user_id, post_id) DO NOTHING",
+            params,
+        )
+        return cursor.rowcount
+
+
+def push_to_author_followers(post_ids):
+    """Fan-out on write: put ``post_ids`` in the timelines of their authors' followers, unless the author is popular."""
+    following = _table(get_user_model().following.through)
+    return _insert_entries(
+        f"""
+        SELECT f.from_user_id, p.id, p.created_at
+        FROM {_table(Post)} p
+        JOIN {following} f ON f.to_user_id = p.author_id
+        LEFT JOIN {_table(AuthorStats)} s ON s.author_id = p.author_id
+        WHERE p.id = ANY(%s) AND p.deleted_at IS NULL AND COALESCE(s.follower_count, 0) <= %s
+        """,
+        [list(post_ids), fanout_max_followers()],
+    )
+
+
+def push_to_tag_followers(post_ids, tag_ids=None):
+    """Fan-out on write of ``post_ids`` to the followers of their tags (only ``tag_ids`` when given) that are not popular."""
+    tag_filter = "AND t.id = ANY(%s)" if tag_ids is not None else ""
+    params = [list(post_ids), fanout_max_followers()] + ([list(tag_ids)] if tag_ids is not None else [])
+    return _insert_entries(
+        f"""
+        SELECT DISTINCT tf.user_id, p.id, p.created_at
+        FROM {_table(Post)} p
+        JOIN {_table(Post.tags.through)} pt ON pt.post_id = p.id
+        JOIN {_table(Tag)} t ON t.id = pt.tag_id
+        JOIN {_table(Tag.followers.through)} tf ON tf.tag_id = t.id
+        WHERE p.id = ANY(%s) AND p.deleted_at IS NULL AND t.follower_count <= %s {tag_filter}
+        """,
+        params,
+    )
+
+
+def fan_out(post_ids):
+    push_to_author_followers(post_ids)
+    push_to_tag_followers(post_ids)
+
+
+def pull_popular_posts(user):
+    """Fan-out on read: copy the posts of the popular authors and tags ``user`` follows into their timeline.
+
+    One INSERT ... SELECT over the posts created since the previous pull, whose time is kept in
+    the user's feed_pulled_at; before the first pull it reaches back over the whole retention.
+    """
+    now = timezone.now()
+    since = user.feed_pulled_at - PULL_OVERLAP if user.feed_pulled_at is not None else now - feed_retention()
+    following = _table(get_user_model().following.through)
+    limit = fanout_max_followers()
+    pulled = _insert_entries(
+        f"""
+        SELECT %s, p.id, p.created_at
+        FROM {_table(Post)} p
+        WHERE p.deleted_at IS NULL AND p.created_at > %s AND (
+            p.author_id IN (
+                SELECT f.to_user_id FROM {following} f
+                JOIN {_table(AuthorStats)} s ON s.author_id = f.to_user_id
+                WHERE f.from_user_id = %s AND s.follower_count > %s
+            )
+            OR EXISTS (
+                SELECT 1 FROM {_table(Post.tags.through)} pt
+                JOIN {_table(Tag)} t ON t.id = pt.tag_id
+                JOIN {_table(Tag.followers.through)} tf ON tf.tag_id = t.id
+                WHERE pt.post_id = p.id AND tf.user_id = %s AND t.follower_count > %s
+            )
+        )
+        """,
+        [user.pk, since, user.pk, limit, user.pk, limit],
+    )
+    # an UPDATE rather than save(), the user's signals and updated_at are not about this
+    get_user_model().objects.filter(pk=user.pk).update(feed_pulled_at=now)
+    user.feed_pulled_at = now
+    return pulled
+
+
+def backfill_authors(user_ids, author_ids):
+    """The recent posts of newly followed authors, popular or not, so the feed does not start empty."""
+    return _insert_entries(
+        f"""
+        SELECT u.id, p.id, p.created_at
+        FROM {_table(Post)} p CROSS JOIN unnest(%s::bigint[]) AS u(id)
+        WHERE p.author_id = ANY(%s) AND p.deleted_at IS NULL AND p.created_at > %s
+        """,
+        [list(user_ids), list(author_ids), timezone.now() - feed_retention()],
+    )
+
+
+def backfill_tags(user_ids, tag_ids):
+    return _insert_entries(
+        f"""
+        SELECT DISTINCT u.id, p.id, p.created_at
+        FROM {_table(Post)} p
+        JOIN {_table(Post.tags.through)} pt ON pt.post_id = p.id
+        CROSS JOIN unnest(%s::bigint[]) AS u(id)
+        WHERE pt.tag_id = ANY(%s) AND p.deleted_at IS NULL AND p.created_at > %s
+        """,
+        [list(user_ids), list(tag_ids), timezone.now() - feed_retention()],
+    )
+
+
+def _still_followed():
+    """Entries whose post the user still follows through its author or one of its tags."""
+    by_author = get_user_model().following.through.objects.filter(
+        from_user=OuterRef("user_id"), to_user=OuterRef("post__author_id")
+    )
+    by_tag = Tag.followers.through.objects.filter(user=OuterRef("user_id"), tag__posts=OuterRef("post_id"))
+    return Q(Exists(by_author)) | Q(Exists(by_tag))
+
+
+def drop_authors(user_ids, author_ids):
+    """Take unfollowed authors' posts out of the timelines, except those still followed through a tag."""
+    entries = FeedEntry.objects.filter(user_id__in=user_ids, post__author_id__in=author_ids)
+    return entries.exclude(_still_followed()).delete()[0]
+
+
+def drop_tags(user_ids, tag_ids):
+    entries = FeedEntry.objects.filter(user_id__in=user_ids, post__tags__in=tag_ids)
+    return FeedEntry.objects.filter(pk__in=entries.values("pk")).exclude(_still_followed()).delete()[0]
+
+
+def prune_feed_entries():
+    return FeedEntry.objects.filter(created_at__lt=timezone.now() - feed_retention()).delete()[0]
@@ -1,5 +1,7 @@
 import django_filters
+from rest_framework.filters import BaseFilterBackend
 from .models import Post
+from .search import search_posts
 
 class NumberInFilter(django_filters.BaseInFilter, django_filters.NumberFilter):
     """multiple numbers (ids=1,2,3)"""
@@ -14,3 +16,29 @@ class PostFilter(django_filters.FilterSet):
     class Meta:
         model = Post
         fields = ["id", "ids", "author", "created_at"]
+
+
+class PostSearchFilter(BaseFilterBackend):
+    """?search= full-text search over Post.search_vector, ranked, with highlighted snippets"""
+    search_param = "search"
+
+    def get_search_terms(self, request):
+        return request.query_params.get(self.search_param, "").strip()
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return search_posts(queryset, terms)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.search_param,
+                "required": False,
+                "in": "query",
+                "description": "Full-text search over title and content.",
+                "schema": {"type": "string"},
+            },
+        ]
+
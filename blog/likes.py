@@ -0,0 +1,60 @@
+from django.db import connection
+
+from .models import Post
+
+
+
+def _like_statement(change, counter_delta):
+    """One statement that applies ``change`` to the like row and moves the post's like_count with it.
+
+    ``change`` is a data-modifying CTE returning the post_id of the row it touched, if any. The
+    counter is bumped in place instead of recounted, so a like costs the same whatever the post's
+    like count, and the post row is locked only for this statement. Returns
+    ``(changed, like_count)``, ``like_count`` is None when there is no such live post.
+    """
+    posts = connection.ops.quote_name(Post._meta.db_table)
+    return f"""
+        WITH post AS (SELECT id, like_count FROM {posts} WHERE id = %(post)s AND deleted_at IS NULL),
+        change AS ({change}),
+        counted AS (
+            UPDATE {posts} SET like_count = GREATEST(like_count + {counter_delta}, 0), activity_at = now()
+            WHERE id IN (SELECT post_id FROM change)
+            RETURNING like_count
+        )
+        SELECT EXISTS (SELECT 1 FROM counted), COALESCE((SELECT like_count FROM counted), (SELECT like_count FROM post))
+    """
+
+
+def _execute(sql, post_id, user_id):
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {"post": post_id, "user": user_id})
+        return cursor.fetchone()
+
+
+def like_post(post_id, user_id):
+    """Idempotent like: an INSERT ... ON CONFLICT DO NOTHING on the likes table, see _like_statement()."""
+    likes = connection.ops.quote_name(Post.likes.through._meta.db_table)
+    insert = f"""
+        INSERT INTO {likes} (post_id, user_id) SELECT id, %(user)s FROM post
+        ON CONFLICT (post_id, user_id) DO NOTHING
+        RETURNING post_id
+    """
+    return _execute(_like_statement(insert, "+ 1"), post_id, user_id)
+
+
+def unlike_post(post_id, user_id):
+    likes = connection.ops.quote_name(Post.likes.through._meta.db_table)
+    delete = f"""
+        DELETE FROM {likes} WHERE post_id IN (SELECT id FROM post) AND user_id = %(user)s
+        RETURNING post_id
+    """
+    return _execute(_like_statement(delete, "- 1"), post_id, user_id)
+
+
+def liked_post_ids(user, post_ids):
+    """The ``post_ids`` liked by ``user``, in one ``IN`` query."""
+    if not post_ids or user is None or not user.is_authenticated:
+        return set()
+    return set(
+        Post.likes.through.objects.filter(user_id=user.pk, post_id__in=post_ids).values_list("post_id", flat=True)
+    )
@@ -0,0 +1,219 @@
+import json
+import platform
+import statistics
+import subprocess
+import time
+from unittest import mock
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, teardown_test_environment
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+from rest_framework.throttling import SimpleRateThrottle
+
+from blog.cache import response_cache
+from blog.models import Post, Tag, Comment
+from blog.seeding import PROFILES
+from drf_practice.instrumentation import collect, instrument_database, instrument_serializers
+
+
+
+# name -> path; {post}, {tag} and {user} are filled with the busiest objects of the dataset
+ENDPOINTS = {
+    "post-list": "/api/blog/list",
+    "post-search": "/api/blog/list?search=django cache",
+    "posts": "/api/blog/posts",
+    "post-detail": "/api/blog/posts/{post}",
+    "post-comments": "/api/blog/posts/{post}/comments",
+    "tags": "/api/blog/tags",
+    "tag-detail": "/api/blog/tags/{tag}",
+    "tag-comments": "/api/blog/tags/{tag}/comments",
+    "comments": "/api/blog/comments",
+    "analytics": "/api/blog/analytics",
+    "analytics-authors": "/api/blog/analytics/authors",
+    "analytics-posts": "/api/blog/analytics/posts",
+    "analytics-tags": "/api/blog/analytics/tags",
+    "users": "/api/users/",
+    "user-detail": "/api/users/{user}/",
+}
+
+
+class Command(BaseCommand):
+    help = "Benchmark the API endpoints in-process on a seeded throwaway database and report latency percentiles"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profile", choices=sorted(PROFILES, key=lambda name: PROFILES[name]["posts"]), default="small",
+            help="seed_dataset profile to run against (default small)"
+        )
+        parser.add_argument(
+            "--iterations", type=int, default=50,
+            help="Timed requests per endpoint (default 50)"
+        )
+        parser.add_argument(
+            "--warmup", type=int, default=3,
+            help="Untimed requests per endpoint before measuring (default 3)"
+        )
+        parser.add_argument(
+            "--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS),
+            help="Endpoints to run (default all)"
+        )
+        parser.add_argument(
+            "--cold_cache", action="store_true",
+            help="Clear the response cache before every request"
+        )
+        parser.add_argument(
+            "--keepdb", action="store_true",
+            help="Keep the seeded benchmark database for the next run of the same profile"
+        )
+        parser.add_argument(
+            "--output",
+            help="Write the results as JSON to this file"
+        )
+        parser.add_argument(
+            "--compare",
+            help="JSON file of an earlier run to print p50/p95 deltas against"
+        )
+
+    def handle(self, *args, **options):
+        baseline = self.load(options["compare"]) if options["compare"] else None
+
+        # one database per profile, so --keepdb never mixes dataset sizes
+        connection.settings_dict.setdefault("TEST", {})["NAME"] = f"benchmark_{options['profile']}"
+        # DEBUG off like the test runner, otherwise the debug toolbar dominates every timing
+        setup_test_environment(debug=False)
+        old_config = setup_databases(verbosity=0, interactive=False, keepdb=options["keepdb"])
+        try:
+            if not Post.objects.exists():
+                self.stdout.write(f"Seeding profile {options['profile']}...")
+                call_command("seed_dataset", profile=options["profile"], stdout=self.stdout)
+            results = self.run_all(options)
+        finally:
+            teardown_databases(old_config, verbosity=0, keepdb=options["keepdb"])
+            teardown_test_environment()
+
+        self.report(results, baseline)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def run_all(self, options):
+        instrument_database()
+        instrument_serializers()
+        user = get_user_model().objects.order_by("pk").first()
+        post = Post.objects.order_by("-comment_count", "pk").first()
+        tag = Tag.objects.order_by("-post_count", "pk").first()
+        ids = {"post": post.pk, "tag": tag.pk, "user": user.pk}
+
+        client = APIClient()
+        client.force_authenticate(user)
+
+        results = {
+            "meta": {
+                "profile": options["profile"],
+                "iterations": options["iterations"],
+                "cold_cache": options["cold_cache"],
+                "commit": self.git_commit(),
+                "timestamp": timezone.now().isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "dataset": {
+                    "users": get_user_model().objects.count(),
+                    "tags": Tag.objects.count(),
+                    "posts": Post.objects.count(),
+                    "comments": Comment.objects.count(),
+                },
+            },
+            "endpoints": {},
+        }
+
+        # the throttles still run, they just never reject a benchmark request
+        rates = {scope: "1000000/second" for scope in SimpleRateThrottle.THROTTLE_RATES}
+        with mock.patch.dict(SimpleRateThrottle.THROTTLE_RATES, rates):
+            for name in options["endpoints"]:
+                path = ENDPOINTS[name].format(**ids)
+                for _ in range(options["warmup"]):
+                    self.measure(client, path, options["cold_cache"])
+                samples = [self.measure(client, path, options["cold_cache"]) for _ in range(options["iterations"])]
+                results["endpoints"][name] = self.summarize(path, samples)
+        return results
+
+    def measure(self, client, path, cold_cache):
+        if cold_cache:
+            response_cache().clear()
+        with collect() as timings:
+            start = time.perf_counter()
+            response = client.get(path)
+            elapsed = time.perf_counter() - start
+        return {
+            "status": response.status_code,
+            "ms": elapsed * 1000,
+            "queries": timings.counts["queries"],
+            "sql_ms": timings.spans["db"] * 1000,
+            "serialize_ms": timings.spans["serialize"] * 1000,
+            "bytes": len(response.content),
+            "cache_hit": response.get("X-Cache") == "HIT",
+        }
+
+    def summarize(self, path, samples):
+        latencies = [sample["ms"] for sample in samples]
+        return {
+            "path": path,
+            "status": sorted({sample["status"] for sample in samples}),
+            "p50_ms": self.percentile(latencies, 50),
+            "p95_ms": self.percentile(latencies, 95),
+            "p99_ms": self.percentile(latencies, 99),
+            "mean_ms": statistics.mean(latencies),
+            "queries": max(sample["queries"] for sample in samples),
+            "sql_ms": statistics.median(sample["sql_ms"] for sample in samples),
+            "serialize_ms": statistics.median(sample["serialize_ms"] for sample in samples),
+            "bytes": statistics.median(sample["bytes"] for sample in samples),
+            "cache_hit_ratio": sum(sample["cache_hit"] for sample in samples) / len(samples),
+        }
+
+    def report(self, results, baseline):
+        meta = results["meta"]
+        self.stdout.write(f"Profile {meta['profile']} {meta['dataset']}, {meta['iterations']} requests per endpoint")
+        self.stdout.write(
+            f"{'endpoint':<20}{'status':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+            f"{'queries':>9}{'sql ms':>9}{'ser ms':>9}{'bytes':>10}{'hits':>6}"
+        )
+        for name, row in results["endpoints"].items():
+            line = (
+                f"{name:<20}{','.join(map(str, row['status'])):>8}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}"
+                f"{row['p99_ms']:>9.2f}{row['queries']:>9}{row['sql_ms']:>9.2f}{row['serialize_ms']:>9.2f}"
+                f"{row['bytes']:>10.0f}{row['cache_hit_ratio']:>6.0%}"
+            )
+            before = (baseline or {}).get("endpoints", {}).get(name)
+            if before:
+                line += f"  p50 {self.delta(before['p50_ms'], row['p50_ms'])} p95 {self.delta(before['p95_ms'], row['p95_ms'])}"
+                line += f" queries {row['queries'] - before['queries']:+d}"
+            self.stdout.write(line)
+
+    def load(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Cannot read {path}: {exc}")
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def delta(self, before, after):
+        return f"{(after - before) / before:+.0%}" if before else "n/a"
+
+    def percentile(self, timings, pct):
+        ordered = sorted(timings)
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
@@ -0,0 +1,79 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from blog.models import Post, Comment
+from blog.serializers import PostSerializer
+from drf_practice.renderers import ORJSONRenderer
+
+
+
+RENDERERS = {
+    "json": JSONRenderer,
+    "orjson": ORJSONRenderer,
+}
+
+
+class Command(BaseCommand):
+    help = "Compare the rendering throughput of the JSON renderers on large PostSerializer payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--posts", type=int, default=500,
+            help="Posts per payload, the busiest ones of the database (default 500)"
+        )
+        parser.add_argument(
+            "--iterations", type=int, default=20,
+            help="Timed renders per renderer (default 20)"
+        )
+        parser.add_argument(
+            "--comments", choices=("full", "none"), default="full",
+            help="Embed every comment of the posts, or none (default full)"
+        )
+
+    def handle(self, *args, **options):
+        data = self.payload(options["posts"], options["comments"])
+        if not data:
+            raise CommandError("No posts to render, run seed_dataset first.")
+
+        results = {}
+        for name, renderer_class in RENDERERS.items():
+            renderer = renderer_class()
+            content = renderer.render(data, renderer_class.media_type, {})
+            samples = []
+            for _ in range(options["iterations"]):
+                start = time.perf_counter()
+                renderer.render(data, renderer_class.media_type, {})
+                samples.append(time.perf_counter() - start)
+            results[name] = (content, statistics.median(samples))
+
+        # the fast path must produce the same document
+        if json.loads(results["orjson"][0]) != json.loads(results["json"][0]):
+            raise CommandError("orjson output differs from JSONRenderer output.")
+
+        self.stdout.write(
+            f"{len(data)} posts, {sum(len(post['comments']) for post in data)} comments, "
+            f"median of {options['iterations']} renders"
+        )
+        self.stdout.write(f"{'renderer':<10}{'ms':>10}{'bytes':>12}{'MB/s':>10}")
+        for name, (content, seconds) in results.items():
+            self.stdout.write(
+                f"{name:<10}{seconds * 1000:>10.2f}{len(content):>12}{len(content) / seconds / 1e6:>10.1f}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"orjson speedup: {results['json'][1] / results['orjson'][1]:.1f}x"))
+
+    def payload(self, count, comments):
+        queryset = Post.objects.select_related("author", "latest_comment").prefetch_related("tags")
+        if comments == "full":
+            queryset = queryset.prefetch_related(Prefetch("comments", Comment.objects.select_related("author")))
+        else:
+            queryset = queryset.prefetch_related(Prefetch("comments", Comment.objects.none(), to_attr="comment_preview"))
+        posts = list(queryset.order_by("-comment_count", "pk")[:count])
+        request = APIRequestFactory().get("/api/blog/posts", HTTP_HOST="localhost")
+        return PostSerializer(posts, many=True, context={"request": request}).data
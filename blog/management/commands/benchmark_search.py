@@ -0,0 +1,85 @@
+import statistics
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from rest_framework.filters import SearchFilter
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from blog.filters import PostSearchFilter
+from blog.models import Post
+
+
+
+class LegacySearchView:
+    # what PostListAPIView used to declare for rest_framework.filters.SearchFilter
+    search_fields = ["title", "content", "author__username"]
+
+
+class Command(BaseCommand):
+    help = "Benchmark the full-text post search against the old SearchFilter (ILIKE) on the current data"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--terms", nargs="+", default=["auto", "content for auto", "post 1000"],
+            help="Search terms to time"
+        )
+        parser.add_argument(
+            "--iterations", type=int, default=20,
+            help="Timed runs per term and engine (default 20)"
+        )
+        parser.add_argument(
+            "--page_size", type=int, default=20,
+            help="Rows fetched per query (default 20)"
+        )
+        parser.add_argument(
+            "--seed_posts", type=int, default=0,
+            help="Run create_posts with this many posts first (default 0: use existing data)"
+        )
+
+    def handle(self, *args, **options):
+        if options["seed_posts"]:
+            call_command("create_posts", total_posts=options["seed_posts"], stdout=self.stdout)
+
+        self.stdout.write(f"Posts in table: {Post.objects.count()}")
+        self.stdout.write(f"{'term':<24}{'engine':<12}{'matches':>9}{'p50 ms':>10}{'p95 ms':>10}")
+
+        for term in options["terms"]:
+            request = Request(APIRequestFactory().get("/", {"search": term}))
+            legacy = SearchFilter().filter_queryset(request, Post.objects.all(), LegacySearchView())
+            fulltext = PostSearchFilter().filter_queryset(request, Post.objects.all(), None)
+
+            # the old list endpoint also ran a COUNT(*) for PageNumberPagination
+            def run_legacy():
+                list(legacy.order_by("-created_at")[:options["page_size"]])
+                return legacy.count()
+
+            def run_fulltext():
+                list(fulltext.order_by("-search_rank", "-id")[:options["page_size"]])
+                return fulltext.count()
+
+            results = {}
+            for name, run in (("ilike", run_legacy), ("fulltext", run_fulltext)):
+                matches, timings = self.time_runs(run, options["iterations"])
+                results[name] = statistics.median(timings)
+                self.stdout.write(
+                    f"{term[:23]:<24}{name:<12}{matches:>9}{results[name]:>10.2f}{self.percentile(timings, 95):>10.2f}"
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f"{'':<24}speedup x{results['ilike'] / max(results['fulltext'], 1e-6):.1f} (p50)"
+            ))
+
+    def time_runs(self, run, iterations):
+        matches = run()  # warm-up
+        timings = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - start) * 1000)
+        return matches, timings
+
+    def percentile(self, timings, pct):
+        ordered = sorted(timings)
+        return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
@@ -2,7 +2,7 @@ from django.core.management.base import BaseCommand
 
 from django.contrib.auth import get_user_model
 
-from blog.models import Post, Tag, Comment
+from blog.seeding import ensure_tags, seed_posts
 
 
 
@@ -22,6 +22,26 @@ class Command(BaseCommand):
             "--total_comments", type=int, default=500,
             help="Total number of comments to create across all posts (default 500)"
         )
+        parser.add_argument(
+            "--tags_per_post", type=float, default=3.0,
+            help="Average number of tags per post, Poisson distributed over Zipf-popular tags (default 3)"
+        )
+        parser.add_argument(
+            "--seed", type=int, default=None,
+            help="Random seed; the same seed and chunk size produce the same data (default random)"
+        )
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="Worker processes inserting chunks in parallel (default 1)"
+        )
+        parser.add_argument(
+            "--chunk_size", type=int, default=None,
+            help="Posts per chunk and transaction (default SEED_CHUNK_SIZE)"
+        )
+        parser.add_argument(
+            "--no_copy", action="store_true",
+            help="Use bulk_create instead of PostgreSQL COPY"
+        )
 
     def handle(self, *args, **options):
         total_posts = options["total_posts"]
@@ -29,48 +49,34 @@ class Command(BaseCommand):
         total_comments = options["total_comments"]
 
         User = get_user_model()
-        author = User.objects.first()
-        if not author:
+        author_ids = list(User.objects.order_by("pk").values_list("pk", flat=True))
+        if not author_ids:
             self.stdout.write(self.style.ERROR("No user found! Please create a user first."))
             return
 
-        # Create or get all tags
-        tags = []
-        for i in range(1, total_tags + 1):
-            tag, _ = Tag.objects.get_or_create(name=f"Django{i}")
-            tags.append(tag)
+        tag_ids = list(ensure_tags([f"Django{i}" for i in range(1, total_tags + 1)]).values())
 
-        # Create posts
-        posts_to_create = [
-            Post(
-                author=author,
-                title=f"Generat Post {i+1}",
-                content=f"This is content for auto post {i+1} with {total_tags} tags."
+        def progress(posts, rows, elapsed):
+            self.stdout.write(
+                f"{posts}/{total_posts} posts, {rows} rows, {rows / max(elapsed, 1e-6):,.0f} rows/s"
             )
-            for i in range(total_posts)
-        ]
-        posts = Post.objects.bulk_create(posts_to_create)
-        for post in posts:
-            post.tags.set(tags)
 
-        comments_to_create = []
-        comments_per_post = max(1, total_comments // total_posts)
-        extra_comments = total_comments % total_posts
-
-        for idx, post in enumerate(posts):
-            for j in range(1, comments_per_post + 1):
-                comments_to_create.append(
-                    Comment(post=post, author=author, content=f"Auto comment {j} for post {post.id}")
-                )
-            if idx < extra_comments:
-                comments_to_create.append(
-                    Comment(post=post, author=author, content=f"Extra auto comment for post {post.id}")
-                )
-
-        Comment.objects.bulk_create(comments_to_create)
+        seed, posts, rows, elapsed = seed_posts(
+            total_posts,
+            total_comments,
+            tag_ids,
+            author_ids=author_ids,
+            tags_per_post=options["tags_per_post"],
+            seed=options["seed"],
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+            use_copy=False if options["no_copy"] else None,
+            progress=progress,
+        )
 
         self.stdout.write(
             self.style.SUCCESS(
-                f"Created {total_posts} posts with {total_tags} tags each and {total_comments} comments total."
+                f"Created {posts} posts, {total_tags} tags and {total_comments} comments "
+                f"({rows} rows in {elapsed:.1f}s, {rows / max(elapsed, 1e-6):,.0f} rows/s, seed {seed})."
             )
         )
@@ -0,0 +1,62 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.export import EXPORT_FORMATS, EXPORT_TYPES, export
+from blog.filters import PostFilter
+from blog.models import Post
+
+
+
+class Command(BaseCommand):
+    help = "Stream every post, or every comment, as NDJSON or CSV with constant memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--type", choices=EXPORT_TYPES, default="posts",
+            help="Export posts, or the comments of the selected posts (default posts)"
+        )
+        parser.add_argument(
+            "--format", choices=EXPORT_FORMATS, default="ndjson",
+            help="Output format (default ndjson)"
+        )
+        parser.add_argument(
+            "--output",
+            help="File to write to (default stdout)"
+        )
+        parser.add_argument(
+            "--chunk_size", type=int, default=None,
+            help="Rows fetched per round trip of the server-side cursor (default EXPORT_CHUNK_SIZE)"
+        )
+        # the PostFilter filters of the export endpoint
+        parser.add_argument("--author", type=int, help="Only posts of this author id")
+        parser.add_argument("--ids", help="Only these post ids, comma separated")
+        parser.add_argument("--created_after", help="Only posts created on or after this date (YYYY-MM-DD)")
+        parser.add_argument("--created_before", help="Only posts created on or before this date (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        data = {
+            "author": options["author"],
+            "ids": options["ids"],
+            "created_at_after": options["created_after"],
+            "created_at_before": options["created_before"],
+        }
+        filterset = PostFilter({key: value for key, value in data.items() if value is not None}, queryset=Post.objects.all())
+        if not filterset.is_valid():
+            raise CommandError(f"Invalid filters: {filterset.errors.as_text()}")
+
+        chunks = export(options["type"], options["format"], filterset.qs, chunk_size=options["chunk_size"])
+        if not options["output"]:
+            self.write(sys.stdout.buffer, chunks)
+            return
+        with open(options["output"], "wb") as f:
+            size = self.write(f, chunks)
+        self.stderr.write(self.style.SUCCESS(f"Wrote {size} bytes to {options['output']}"))
+
+    def write(self, f, chunks):
+        size = 0
+        for chunk in chunks:
+            f.write(chunk)
+            size += len(chunk)
+        f.flush()
+        return size
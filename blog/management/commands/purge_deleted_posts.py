@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from blog.purge import purge_deleted_posts
+
+
+
+class Command(BaseCommand):
+    help = "Hard-delete soft-deleted posts past their retention, with their comments, in bounded batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retention_days", type=float, default=None,
+            help="Purge posts deleted more than this many days ago (default POST_PURGE_RETENTION_DAYS)"
+        )
+        parser.add_argument(
+            "--batch_size", type=int, default=None,
+            help="Posts per batch (default POST_PURGE_BATCH_SIZE)"
+        )
+        parser.add_argument(
+            "--comment_batch_size", type=int, default=None,
+            help="Comments deleted per transaction (default POST_PURGE_COMMENT_BATCH_SIZE)"
+        )
+
+    def handle(self, *args, **options):
+        retention = options["retention_days"]
+        posts, comments = purge_deleted_posts(
+            retention=timedelta(days=retention) if retention is not None else None,
+            batch_size=options["batch_size"],
+            comment_batch_size=options["comment_batch_size"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Purged {posts} posts and {comments} comments."))
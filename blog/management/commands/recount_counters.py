@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from blog.counters import refresh_post_counters, refresh_tag_counters, refresh_author_stats
+
+
+
+class Command(BaseCommand):
+    help = "Recompute the denormalized post/tag counters and the analytics rollups in bulk"
+
+    def handle(self, *args, **options):
+        posts = refresh_post_counters()
+        tags = refresh_tag_counters()
+        authors = refresh_author_stats()
+        self.stdout.write(
+            self.style.SUCCESS(f"Recounted counters for {posts} posts, {tags} tags and {authors} authors")
+        )
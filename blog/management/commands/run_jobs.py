@@ -0,0 +1,29 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from blog.scheduler import JOBS, JobRunner
+
+
+
+class Command(BaseCommand):
+    help = "Run the scheduled jobs; start it anywhere, one process of the deployment leads and the rest stand by"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tick", type=float, default=1.0,
+            help="Seconds between checks for due jobs (default 1)"
+        )
+        parser.add_argument(
+            "--standby_interval", type=float, default=5.0,
+            help="Seconds between attempts of a standby to become the leader (default 5)"
+        )
+
+    def handle(self, *args, **options):
+        runner = JobRunner(tick=options["tick"], standby_interval=options["standby_interval"])
+        signal.signal(signal.SIGTERM, lambda signum, frame: runner.stop())
+        self.stdout.write(f"{runner.name}: jobs {', '.join(JOBS)}")
+        try:
+            runner.run()
+        except KeyboardInterrupt:
+            runner.stop()
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.models import Post
+from blog.seeding import PROFILES, ensure_tags, ensure_users, seed_posts
+
+
+
+class Command(BaseCommand):
+    help = "Seed users, tags, posts, threaded comments and likes at one of the fixed benchmark sizes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--profile", choices=sorted(PROFILES, key=lambda name: PROFILES[name]["posts"]), default="small",
+            help="Dataset size (default small)"
+        )
+        parser.add_argument(
+            "--seed", type=int, default=42,
+            help="Random seed (default 42, so every run of a profile has the same shape)"
+        )
+        parser.add_argument(
+            "--workers", type=int, default=1,
+            help="Worker processes inserting chunks in parallel (default 1)"
+        )
+        parser.add_argument(
+            "--no_copy", action="store_true",
+            help="Use bulk_create instead of PostgreSQL COPY"
+        )
+        parser.add_argument(
+            "--append", action="store_true",
+            help="Seed even if the database already has posts"
+        )
+
+    def handle(self, *args, **options):
+        profile = PROFILES[options["profile"]]
+        if not options["append"] and Post.objects.exists():
+            raise CommandError(
+                "The database already has posts, so the result would not match the profile. "
+                "Use --append to seed anyway."
+            )
+
+        author_ids = ensure_users(profile["users"])
+        tag_ids = list(ensure_tags([f"Django{i}" for i in range(1, profile["tags"] + 1)]).values())
+        self.stdout.write(f"{len(author_ids)} users, {len(tag_ids)} tags")
+
+        def progress(posts, rows, elapsed):
+            self.stdout.write(
+                f"{posts}/{profile['posts']} posts, {rows} rows, {rows / max(elapsed, 1e-6):,.0f} rows/s"
+            )
+
+        seed, posts, rows, elapsed = seed_posts(
+            profile["posts"],
+            profile["comments"],
+            tag_ids,
+            author_ids=author_ids,
+            tags_per_post=profile["tags_per_post"],
+            likes_per_post=profile["likes_per_post"],
+            reply_ratio=profile["reply_ratio"],
+            max_depth=profile["max_depth"],
+            seed=options["seed"],
+            workers=options["workers"],
+            use_copy=False if options["no_copy"] else None,
+            progress=progress,
+        )
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Seeded profile {options['profile']}: {posts} posts, {profile['comments']} comments "
+                f"({rows} rows in {elapsed:.1f}s, {rows / max(elapsed, 1e-6):,.0f} rows/s, seed {seed})."
+            )
+        )
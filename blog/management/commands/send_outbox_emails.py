@@ -0,0 +1,44 @@
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from blog.outbox import drain_outbox
+
+
+
+class Command(BaseCommand):
+    help = "Worker that drains the email outbox in batches over one reused mail connection"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size", type=int, default=None,
+            help="Emails claimed per batch (default EMAIL_OUTBOX_BATCH_SIZE)"
+        )
+        parser.add_argument(
+            "--interval", type=float, default=5.0,
+            help="Seconds to sleep when the outbox is empty (default 5)"
+        )
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Drain everything that is due, then exit"
+        )
+
+    def handle(self, *args, **options):
+        connection = get_connection(fail_silently=False)
+        try:
+            while True:
+                sent, failed = drain_outbox(options["batch_size"], connection=connection)
+                if sent or failed:
+                    self.stdout.write(f"Sent {sent} emails, {failed} failed")
+                    continue
+
+                # idle: release the mail server connection until there is work again
+                connection.close()
+                if options["once"]:
+                    break
+                time.sleep(options["interval"])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            connection.close()
@@ -14,12 +14,12 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         total = options['total']
-        tags = []
+        names = [f"django{i}" for i in range(1, total + 1)]
 
-        for i in range(1, total + 1):
-            tag_name = f"django{i}"
-            if not Tag.objects.filter(name=tag_name).exists():
-                tags.append(Tag(name=tag_name))
+        # one query for the names that already exist instead of one per candidate
+        existing = set(Tag.objects.filter(name__in=names).values_list("name", flat=True))
+        tags = [Tag(name=name) for name in names if name not in existing]
 
-        Tag.objects.bulk_create(tags)
+        # ignore_conflicts covers tags created concurrently since the check
+        Tag.objects.bulk_create(tags, ignore_conflicts=True, batch_size=10000)
         self.stdout.write(self.style.SUCCESS(f"Successfully created {len(tags)} tags"))
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_counters(apps, schema_editor):
+    Post = apps.get_model('blog', 'Post')
+    Comment = apps.get_model('blog', 'Comment')
+    Like = Post.likes.through
+
+    def count_of(queryset):
+        return Coalesce(
+            Subquery(queryset.order_by().values('post').annotate(total=Count('pk')).values('total')[:1]), 0
+        )
+
+    comments = Comment.objects.filter(post=OuterRef('pk'))
+    Post.objects.update(
+        comment_count=count_of(comments),
+        like_count=count_of(Like.objects.filter(post=OuterRef('pk'))),
+        latest_comment=Subquery(comments.order_by('-created_at', '-pk').values('pk')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0005_post_likes_alter_post_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='latest_comment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='blog.comment'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def queue_existing_images(apps, schema_editor):
+    Post = apps.get_model("blog", "Post")
+    Post._base_manager.exclude(image="").exclude(image=None).update(image_variants=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog', '0015_jobrun'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, null=True),
+        ),
+        migrations.RunPython(queue_existing_images, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('image_variants__isnull', True)), fields=['id'], name='blog_post_variants_queue_idx'),
+        ),
+    ]
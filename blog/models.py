@@ -1,41 +1,171 @@
-from django.db import models
+from django.db import models, transaction
+from django.dispatch import Signal
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import User
 from django.conf import settings
 from django.utils import timezone   
 from django.core.exceptions import ValidationError
 
+from drf_practice.images import StoredFilesModelMixin, max_image_size
+
 
 
 def validate_image_size(image):
-    max_size_mb = 2
-    if image.size > max_size_mb * 1024 * 1024:
-        raise ValidationError(f"Image size must be less than {max_size_mb} MB!")
+    if image.size > max_image_size():
+        raise ValidationError(f"Image size must be less than {max_image_size() // (1024 * 1024)} MB!")
     
 
 class Tag(models.Model):
     name = models.CharField(max_length=50, unique=True)
+    # users whose feed gets the tag's posts (see blog.feed)
+    followers = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name="followed_tags", blank=True)
+    # denormalized, kept in sync by blog.signals (see blog.counters)
+    post_count = models.PositiveIntegerField(default=0)
+    follower_count = models.PositiveIntegerField(default=0)
 
     def __str__(self):
         return self.name
     
 
-class Post(models.Model):
+# sent with ``post_ids`` and ``author_ids`` (one per post) after posts are soft-deleted, see blog.signals
+post_soft_deleted = Signal()
+
+
+class PostQuerySet(models.QuerySet):
+    def soft_delete(self):
+        """Hide the posts at once with one UPDATE of ``deleted_at``.
+
+        The rows, their comments and likes stay until blog.purge removes them in batches, so
+        deleting a busy post costs the request nothing proportional to its comments.
+        """
+        with transaction.atomic():
+            rows = list(
+                Post.all_objects.filter(pk__in=self.values("pk"), deleted_at__isnull=True)
+                .select_for_update()
+                .values_list("pk", "author_id")
+            )
+            if not rows:
+                return 0
+            post_ids = [pk for pk, _ in rows]
+            Post.all_objects.filter(pk__in=post_ids).update(deleted_at=timezone.now())
+            post_soft_deleted.send(sender=Post, post_ids=post_ids, author_ids=[author_id for _, author_id in rows])
+        return len(rows)
+
+    def delete(self):
+        count = self.soft_delete()
+        return count, {Post._meta.label: count}
+
+    def hard_delete(self):
+        return super().delete()
+
+
+class LivePostManager(models.Manager.from_queryset(PostQuerySet)):
+    """The default manager: soft-deleted posts are left out of every query, reverse relations included."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class Post(StoredFilesModelMixin, models.Model):
     author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True,  blank=True, )
     title = models.CharField(max_length=200, db_index=True)
     content = models.TextField()
     image = models.ImageField(upload_to='images/', blank=True, null=True, validators=[validate_image_size])
+    # {variant: storage name} of the resized copies, NULL while queued (see drf_practice.images)
+    image_variants = models.JSONField(default=dict, null=True, blank=True, editable=False)
     likes = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name="liked_posts", blank=True)
     tags = models.ManyToManyField(Tag, related_name="posts", blank=True)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
     deleted_at = models.DateTimeField(null=True, blank=True)
 
+    # denormalized counters, kept in sync by blog.signals (see blog.counters)
+    comment_count = models.PositiveIntegerField(default=0)
+    like_count = models.PositiveIntegerField(default=0)
+    # last comment or like change; with updated_at it drives the ETag/Last-Modified validators
+    activity_at = models.DateTimeField(null=True, blank=True)
+    latest_comment = models.ForeignKey(
+        "Comment",
+        related_name="+",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+    )
+    # weighted title/content tsvector, refreshed on save (see blog.search)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # file fields whose blobs blog.signals reference-counts (see blog.storage)
+    stored_file_fields = ("image",)
+
+    objects = LivePostManager()
+    # soft-deleted posts too, for the purge and admin repairs
+    all_objects = PostQuerySet.as_manager()
+
     class Meta:
         ordering = ("created_at",)
+        # forward relations (comment.post) still resolve while a post waits for its purge
+        base_manager_name = "all_objects"
+        indexes = [
+            # keyset pagination seeks on (created_at, id), always of live posts
+            models.Index(
+                fields=["created_at", "id"], condition=models.Q(deleted_at__isnull=True),
+                name="blog_post_live_created_idx",
+            ),
+            # the purge scans only the few soft-deleted rows
+            models.Index(
+                fields=["deleted_at"], condition=models.Q(deleted_at__isnull=False), name="blog_post_deleted_at_idx"
+            ),
+            GinIndex(fields=["search_vector"], name="blog_post_search_idx"),
+            # images waiting for their variants
+            models.Index(fields=["id"], condition=models.Q(image_variants__isnull=True), name="blog_post_variants_queue_idx"),
+            # the recent posts of one author, for feed backfills
+            models.Index(
+                fields=["author", "created_at"], condition=models.Q(deleted_at__isnull=True),
+                name="blog_post_author_created_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so blog.signals can move the post between AuthorStats rows
+        if "author_id" in field_names:
+            instance._loaded_author_id = instance.author_id
+        return instance
+
+    def delete(self, using=None, keep_parents=False):
+        """Soft delete, see PostQuerySet.soft_delete(); hard_delete() removes the row now."""
+        self.deleted_at = self.deleted_at or timezone.now()
+        return Post.all_objects.filter(pk=self.pk).delete()
+
+    def hard_delete(self, using=None, keep_parents=False):
+        return super().delete(using=using, keep_parents=keep_parents)
+
+    @property
+    def has_comments(self):
+        return self.comment_count > 0
+
+
+class AuthorStats(models.Model):
+    """Per-author rollup served by the analytics endpoints, kept in sync by blog.signals."""
+    author = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        primary_key=True,
+        related_name="post_stats",
+        on_delete=models.CASCADE,
+    )
+    post_count = models.PositiveIntegerField(default=0)
+    # decides between fan-out on write and on read for the author's posts (see blog.feed)
+    follower_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.author_id}: {self.post_count} posts"
+
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, related_name="comments", on_delete=models.CASCADE)
@@ -46,14 +176,159 @@ class Comment(models.Model):
         related_name="replies",
         null=True,
         blank=True,
-        on_delete=models.CASCADE
+        on_delete=models.CASCADE,
+        # covered by blog_comment_parent_idx
+        db_index=False,
     )
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ("created_at",)
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="blog_comment_created_id_idx"),
+            models.Index(fields=["post", "created_at", "id"], name="blog_comment_post_created_idx"),
+            # the top-level comments of a post, paged by (created_at, id)
+            models.Index(
+                fields=["post", "created_at", "id"], condition=models.Q(parent__isnull=True),
+                name="blog_comment_post_roots_idx",
+            ),
+            # each step of the recursive thread walk (blog.threads), children in order
+            models.Index(fields=["parent", "created_at", "id"], name="blog_comment_parent_idx"),
+        ]
 
     def __str__(self):
         return f"{self.author}: {self.content[:20]}"
-    
-    
\ No newline at end of file
+
+
+class OutboxEmail(models.Model):
+    """Notification email queued in the same transaction as the change that triggered it.
+
+    Drained by the ``send_outbox_emails`` worker, see blog.outbox.
+    """
+    STATUS_PENDING = "pending"
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+
+    STATUS_CHOICES = (
+        (STATUS_PENDING, "Pending"),
+        (STATUS_SENT, "Sent"),
+        (STATUS_FAILED, "Failed"),
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.EmailField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ("next_attempt_at", "id")
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at", "id"],
+                condition=models.Q(status="pending"),
+                name="blog_outbox_pending_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.to}: {self.subject}"
+
+
+
+class ThrottleBucket(models.Model):
+    """Token bucket of one throttle key, shared by every worker; see blog.throttling."""
+    key = models.CharField(max_length=255, primary_key=True)
+    tokens = models.FloatField()
+    # epoch seconds of the database clock, so hosts with skewed clocks agree
+    checked_at = models.FloatField()
+    allowed = models.BooleanField(default=True)
+
+    def __str__(self):
+        return f"{self.key}: {self.tokens:.2f} tokens"
+
+
+class JobRun(models.Model):
+    """One run of a scheduled job by the leader of ``manage.py run_jobs``, see blog.scheduler."""
+    STATUS_RUNNING = "running"
+    STATUS_SUCCEEDED = "succeeded"
+    STATUS_FAILED = "failed"
+    # due while the previous run of the job was still going
+    STATUS_SKIPPED = "skipped"
+    # left running by a leader that went away
+    STATUS_ABANDONED = "abandoned"
+
+    STATUS_CHOICES = (
+        (STATUS_RUNNING, "Running"),
+        (STATUS_SUCCEEDED, "Succeeded"),
+        (STATUS_FAILED, "Failed"),
+        (STATUS_SKIPPED, "Skipped"),
+        (STATUS_ABANDONED, "Abandoned"),
+    )
+
+    job = models.CharField(max_length=100)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_RUNNING)
+    runner = models.CharField(max_length=255)
+    started_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    duration = models.FloatField(null=True, blank=True)
+    # ran longer than the job's interval
+    overran = models.BooleanField(default=False)
+    result = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ("-started_at", "-id")
+        indexes = [
+            models.Index(fields=["job", "-started_at"], name="blog_jobrun_job_started_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.job} {self.started_at:%Y-%m-%d %H:%M:%S}: {self.status}"
+
+
+class MediaBlob(models.Model):
+    """One file of the content-addressed media storage, shared by every row that uploaded the same bytes.
+
+    See blog.storage; files that are not blobs (the default profile image) have no row.
+    """
+    name = models.CharField(max_length=255, primary_key=True)
+    size = models.BigIntegerField()
+    # files and variants of rows that point at the blob
+    refcount = models.PositiveIntegerField(default=0)
+    # last save or reference change; an unreferenced blob is collected a grace period after it
+    touched_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # the garbage collector only looks at unreferenced blobs
+            models.Index(fields=["touched_at"], condition=models.Q(refcount=0), name="blog_mediablob_unused_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} references)"
+
+
+class FeedEntry(models.Model):
+    """A post in the precomputed timeline of a user who follows its author or one of its tags, see blog.feed."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name="+", on_delete=models.CASCADE)
+    post = models.ForeignKey(Post, related_name="+", on_delete=models.CASCADE)
+    # the post's, so a timeline pages off its own index without touching the posts
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "post"], name="blog_feedentry_user_post_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["user", "-created_at", "-id"], name="blog_feedentry_timeline_idx"),
+            models.Index(fields=["created_at"], name="blog_feedentry_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.post_id}"
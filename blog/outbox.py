@@ -0,0 +1,102 @@
+from contextlib import suppress
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue_email(subject, body, to, from_email=None):
+    """Queue one email; call inside the transaction that makes it necessary."""
+    return OutboxEmail.objects.create(
+        subject=subject,
+        body=body,
+        to=to,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+    )
+
+
+def retry_delay(attempts):
+    """Exponential backoff: base, 2 * base, 4 * base, ... capped at EMAIL_OUTBOX_MAX_BACKOFF seconds."""
+    base = _setting("EMAIL_OUTBOX_RETRY_BACKOFF", 30)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), _setting("EMAIL_OUTBOX_MAX_BACKOFF", 3600)))
+
+
+def lease_duration():
+    """How long a claimed batch is reserved for its worker; a crashed worker's emails are retried after it."""
+    return timedelta(seconds=_setting("EMAIL_OUTBOX_LEASE", 300))
+
+
+def claim_batch(batch_size):
+    """Reserve up to ``batch_size`` due emails and count the attempt, in a transaction of its own.
+
+    Rows are picked with SELECT ... FOR UPDATE SKIP LOCKED and leased by moving their
+    next_attempt_at past the lease, so other workers skip them once this commits.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboxEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxEmail.STATUS_PENDING, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "id")[:batch_size]
+        )
+        if batch:
+            OutboxEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+                attempts=F("attempts") + 1, next_attempt_at=now + lease_duration()
+            )
+    for email in batch:
+        email.attempts += 1
+    return batch
+
+
+def drain_outbox(batch_size=None, connection=None):
+    """Send one batch of due emails over a single mail connection.
+
+    The batch is claimed and committed first (claim_batch()), then sent with no transaction or
+    row lock held, and the outcomes are written in a second short transaction, so several workers
+    can drain the same table without sending an email twice. Returns ``(sent, failed)``.
+    The connection is left open for the caller to reuse on the next batch.
+    """
+    batch_size = batch_size or _setting("EMAIL_OUTBOX_BATCH_SIZE", 100)
+    max_attempts = _setting("EMAIL_OUTBOX_MAX_ATTEMPTS", 5)
+    connection = connection or get_connection(fail_silently=False)
+
+    sent = failed = 0
+    batch = claim_batch(batch_size)
+    if not batch:
+        return sent, failed
+
+    for email in batch:
+        try:
+            connection.open()
+            connection.send_messages([
+                EmailMessage(email.subject, email.body, email.from_email, [email.to], connection=connection)
+            ])
+        except Exception as exc:
+            failed += 1
+            email.last_error = f"{type(exc).__name__}: {exc}"
+            if email.attempts >= max_attempts:
+                email.status = OutboxEmail.STATUS_FAILED
+            else:
+                email.next_attempt_at = timezone.now() + retry_delay(email.attempts)
+            # drop a possibly broken session, the next message reconnects
+            with suppress(Exception):
+                connection.close()
+        else:
+            sent += 1
+            email.status = OutboxEmail.STATUS_SENT
+            email.sent_at = timezone.now()
+            email.last_error = ""
+
+    with transaction.atomic():
+        OutboxEmail.objects.bulk_update(batch, ["status", "next_attempt_at", "last_error", "sent_at"])
+    return sent, failed
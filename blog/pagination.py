@@ -1,8 +1,285 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import datetime
+import json
+from collections import OrderedDict
 
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .threads import comment_threads
+
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoder truncates datetimes to milliseconds, which would make cursors skip rows
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
 
 
 class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 2 
+    page_size = 2
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination keyed on a composite ordering such as ``(created_at, id)``.
+
+    Each page is a range scan starting right after the last row of the previous page,
+    so there is no OFFSET and no COUNT(*) and deep pages cost the same as the first one.
+    The cursor is an opaque token holding the key of the boundary row.
+    """
+    ordering = ("-created_at", "-id")
+    page_size = 2
     page_size_query_param = "page_size"
     max_page_size = 100
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        position, reverse = self.decode_cursor(request)
+        if position is not None:
+            position = self.clean_position(queryset, position)
+        ordering = self.ordering if not reverse else tuple(_invert(field) for field in self.ordering)
+
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(ordering, position))
+
+        results = self.fetch(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        # a reverse cursor is only handed out from a later page, so there is always a next page
+        self.has_next = has_more if not reverse else True
+        self.has_previous = position is not None if not reverse else has_more
+        self.page = results
+        return results
+
+    def fetch(self, queryset):
+        """Evaluate the page (plus one row to tell whether there is a next page)."""
+        return list(queryset)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, request, queryset, view):
+        """Use the OrderingFilter choice when the view has one, always ending on the primary key.
+
+        A choice that is not a plain column of the model (or an annotation) cannot be sought on
+        or put in a cursor, the default ordering is used instead.
+        """
+        ordering = None
+        for backend in getattr(view, "filter_backends", ()):
+            if issubclass(backend, OrderingFilter):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        if ordering and not all(_ordering_field(queryset, field) is not None for field in ordering):
+            ordering = None
+        ordering = tuple(ordering or self.ordering)
+        if ordering[-1].lstrip("-") not in ("id", "pk"):
+            ordering += ("-id",) if ordering[0].startswith("-") else ("id",)
+        return ordering
+
+    def clean_position(self, queryset, position):
+        """Convert the cursor's values to the ordering fields' types; the cursor is client input."""
+        cleaned = []
+        for field_name, value in zip(self.ordering, position):
+            field = _ordering_field(queryset, field_name)
+            try:
+                cleaned.append(value if field is None else field.to_python(value))
+            except (ValidationError, ValueError, TypeError):
+                raise NotFound(self.invalid_cursor_message)
+            if cleaned[-1] is None:
+                raise NotFound(self.invalid_cursor_message)
+        return cleaned
+
+    def seek_filter(self, ordering, position):
+        """Lexicographic ``(f1, f2, ...) > (v1, v2, ...)`` honouring each field's direction."""
+        fields = [field.lstrip("-") for field in ordering]
+        lookups = ["lt" if field.startswith("-") else "gt" for field in ordering]
+
+        condition = Q()
+        for i, (field, lookup) in enumerate(zip(fields, lookups)):
+            clause = Q(**{f"{field}__{lookup}": position[i]})
+            for prev_field, prev_value in zip(fields[:i], position[:i]):
+                clause &= Q(**{prev_field: prev_value})
+            condition |= clause
+
+        # redundant bound on the leading column so the planner can use a plain index range scan
+        leading = Q(**{f"{fields[0]}__{lookups[0]}e": position[0]})
+        return leading & condition
+
+    def get_position(self, obj):
+        position = []
+        for field in self.ordering:
+            value = obj
+            for attr in field.lstrip("-").split("__"):
+                value = getattr(value, attr)
+            position.append(value)
+        return position
+
+    def encode_cursor(self, obj, reverse):
+        payload = json.dumps({"p": self.get_position(obj), "r": int(reverse)}, cls=CursorEncoder)
+        token = base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode("ascii")).decode("utf-8"))
+            position, reverse = payload["p"], bool(payload["r"])
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                "name": self.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "The pagination cursor value.",
+                "schema": {"type": "string"},
+            },
+            {
+                "name": self.page_size_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Number of results to return per page.",
+                "schema": {"type": "integer"},
+            },
+        ]
+
+
+class PostCursorPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+
+
+class FeedPagination(KeysetPagination):
+    """Pages FeedEntry rows along the (user, -created_at, -id) timeline index."""
+    ordering = ("-created_at", "-id")
+    page_size = 20
+
+
+class PostSearchCursorPagination(PostCursorPagination):
+    """Pages search results by relevance; without ?search= it behaves like PostCursorPagination."""
+    search_param = "search"
+
+    def get_ordering(self, request, queryset, view):
+        if request.query_params.get(self.search_param, "").strip():
+            return ("-search_rank", "-id")
+        return super().get_ordering(request, queryset, view)
+
+
+class CommentCursorPagination(KeysetPagination):
+    ordering = ("created_at", "id")
+    page_size = 20
+
+
+class CommentThreadPagination(CommentCursorPagination):
+    """Pages top-level comments, each page loaded with the replies of its threads in one query."""
+    max_depth = 5
+    # replies shown under each comment, the rest is flagged with more_replies
+    max_replies = 10
+
+    def fetch(self, queryset):
+        return comment_threads(queryset, self.max_depth, self.max_replies)
+
+
+class TagCommentCursorPagination(CommentCursorPagination):
+    ordering = ("-created_at", "-id")
+
+
+class AuthorStatsPagination(KeysetPagination):
+    ordering = ("author__username", "pk")
+    page_size = 20
+
+
+class PostStatsPagination(KeysetPagination):
+    ordering = ("title", "id")
+    page_size = 20
+
+
+class TagStatsPagination(KeysetPagination):
+    ordering = ("name", "id")
+    page_size = 20
+
+
+def _ordering_field(queryset, name):
+    """The model field or annotation ``name`` (``-`` and ``__`` paths allowed) orders by, None if it is not a column."""
+    name = name.lstrip("-")
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+    model = queryset.model
+    parts = name.split("__")
+    for i, part in enumerate(parts):
+        try:
+            field = model._meta.pk if part == "pk" else model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        if i < len(parts) - 1:
+            # only follow single-valued relations, a many-valued one repeats rows
+            if not (field.many_to_one or field.one_to_one):
+                return None
+            model = field.related_model
+        elif field.is_relation or not field.concrete:
+            return None
+    return field
+
+
+def _invert(field):
+    return field[1:] if field.startswith("-") else f"-{field}"
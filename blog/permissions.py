@@ -6,6 +6,7 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
    def has_object_permission(self, request, view, obj):
         if request.method in permissions.SAFE_METHODS:
             return True
-        return obj.author == request.user
+        # compare keys, obj.author would load the user; an anonymous user's pk is None like an authorless post's
+        return request.user.is_authenticated and obj.author_id == request.user.pk
 
 
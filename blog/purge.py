@@ -0,0 +1,83 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Post, Comment, FeedEntry
+from .storage import blob_names, release, stored_file_columns
+
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def purge_retention():
+    return timedelta(days=_setting("POST_PURGE_RETENTION_DAYS", 30))
+
+
+def _delete_comment_leaves(post_ids, limit):
+    # replies before their parents, so every statement leaves the parent_id references intact
+    table = connection.ops.quote_name(Comment._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            DELETE FROM {table} WHERE id IN (
+                SELECT c.id FROM {table} c
+                WHERE c.post_id = ANY(%s)
+                  AND NOT EXISTS (SELECT 1 FROM {table} r WHERE r.parent_id = c.id)
+                LIMIT %s
+            )
+            """,
+            [post_ids, limit],
+        )
+        return cursor.rowcount
+
+
+def _delete_posts(post_ids):
+    table = connection.ops.quote_name(Post._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE id = ANY(%s) AND deleted_at IS NOT NULL", [post_ids])
+        return cursor.rowcount
+
+
+def purge_deleted_posts(retention=None, batch_size=None, comment_batch_size=None):
+    """Hard-delete the posts soft-deleted more than ``retention`` ago, with their comments, likes, tags and feed entries.
+
+    Works through ``batch_size`` posts at a time in set-based statements instead of the delete
+    collector: comments go ``comment_batch_size`` rows per transaction, leaves first, then the
+    like, tag and feed rows and the posts in one short transaction. Counters were already updated by
+    the soft delete, so no signals are sent, and the image blobs are released here instead.
+    Safe to run from several workers at once. Returns ``(posts, comments)`` purged.
+    """
+    cutoff = timezone.now() - (retention if retention is not None else purge_retention())
+    batch_size = batch_size or _setting("POST_PURGE_BATCH_SIZE", 100)
+    comment_batch_size = comment_batch_size or _setting("POST_PURGE_COMMENT_BATCH_SIZE", 5000)
+
+    posts = comments = 0
+    while True:
+        post_ids = list(
+            Post.all_objects.filter(deleted_at__lt=cutoff).order_by("deleted_at").values_list("pk", flat=True)[:batch_size]
+        )
+        if not post_ids:
+            return posts, comments
+
+        Post.all_objects.filter(pk__in=post_ids).update(latest_comment=None)
+        while deleted := _delete_comment_leaves(post_ids, comment_batch_size):
+            comments += deleted
+
+        with transaction.atomic():
+            post_ids = list(
+                Post.all_objects.select_for_update(skip_locked=True)
+                .filter(pk__in=post_ids, deleted_at__lt=cutoff)
+                .values_list("pk", flat=True)
+            )
+            # through rows have no signals or dependents, these are single DELETE statements
+            Post.likes.through.objects.filter(post_id__in=post_ids).delete()
+            Post.tags.through.objects.filter(post_id__in=post_ids).delete()
+            FeedEntry.objects.filter(post_id__in=post_ids).delete()
+            rows = Post.all_objects.filter(pk__in=post_ids).values(*stored_file_columns(Post))
+            release(sum((blob_names(Post, row) for row in rows), Counter()))
+            posts += _delete_posts(post_ids)
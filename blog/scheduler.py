@@ -1,20 +1,209 @@
-from apscheduler.schedulers.background import BackgroundScheduler
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, connections, InterfaceError, OperationalError
 from django.utils import timezone
-from .models import Post
+
+from drf_practice.images import generate_pending_variants
+
+from .cache import invalidate
+from .counters import touch_posts
+from .feed import prune_feed_entries
+from .models import Post, JobRun
+from .purge import purge_deleted_posts
+from .storage import collect_garbage
+from .throttling import purge_idle_buckets
+
+
+
+logger = logging.getLogger(__name__)
+
+# key of the session-level advisory lock that makes a run_jobs process the leader
+LEADER_LOCK = "blog.scheduler.leader"
 
 
 def delete_latest_post():
     """Delete the latest (most recently created) post."""
-    latest_post = Post.objects.order_by('-created_at').first()
-    if latest_post:
-        print(f"Deleting latest post: {latest_post.title} (created at {latest_post.created_at})")
-        latest_post.delete()
-        print(f"Deleted 1 latest post at {timezone.now()}")
-    else:
-        print(f"No posts available to delete at {timezone.now()}")
-
-
-def start():
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(delete_latest_post, 'interval', minutes=1)
-    scheduler.start()
+    latest_post = Post.objects.order_by("-created_at").first()
+    if latest_post is None:
+        return "no posts"
+    latest_post.delete()
+    return f"deleted post {latest_post.pk} ({latest_post.title})"
+
+
+def purge_throttle_buckets():
+    # a bucket idle for its whole window is full again, the longest window is a day
+    return purge_idle_buckets(getattr(settings, "THROTTLE_BUCKET_MAX_IDLE", 24 * 3600))
+
+
+def generate_image_variants():
+    """Render the variants of every queued post and profile image, a batch at a time."""
+    posts = users = 0
+    while post_ids := generate_pending_variants(Post, "image"):
+        posts += len(post_ids)
+        # new payloads, so new ETags and cache entries
+        touch_posts(post_ids)
+        invalidate(*(f"post:{post_id}" for post_id in post_ids))
+    while user_ids := generate_pending_variants(get_user_model(), "profile_image"):
+        users += len(user_ids)
+    return f"{posts} posts, {users} users"
+
+
+def prune_job_runs():
+    cutoff = timezone.now() - timedelta(days=getattr(settings, "JOB_RUN_RETENTION_DAYS", 14))
+    return JobRun.objects.filter(started_at__lt=cutoff).exclude(status=JobRun.STATUS_RUNNING).delete()[0]
+
+
+# name -> (callable, interval); the return value of the callable is stored as the run's result
+JOBS = {
+    "delete_latest_post": (delete_latest_post, timedelta(minutes=1)),
+    "generate_image_variants": (generate_image_variants, timedelta(seconds=5)),
+    "purge_deleted_posts": (purge_deleted_posts, timedelta(hours=1)),
+    "purge_throttle_buckets": (purge_throttle_buckets, timedelta(hours=1)),
+    "collect_media_blobs": (collect_garbage, timedelta(hours=1)),
+    "prune_job_runs": (prune_job_runs, timedelta(days=1)),
+    "prune_feed_entries": (prune_feed_entries, timedelta(days=1)),
+}
+
+
+class JobRunner:
+    """Runs JOBS on their intervals in exactly one process of the deployment.
+
+    Every ``run_jobs`` process competes for a PostgreSQL session advisory lock; the holder is the
+    leader and the others wait as standbys. The lock goes with the leader's connection, so a
+    crashed leader is replaced within ``standby_interval`` seconds without any lease to expire.
+    Each run is recorded as a JobRun with its duration, outcome and whether it overran its
+    interval. A job that is due while its previous run is still going is skipped, not stacked.
+    """
+
+    def __init__(self, jobs=None, tick=1.0, standby_interval=5.0):
+        self.jobs = JOBS if jobs is None else jobs
+        self.tick = tick
+        self.standby_interval = standby_interval
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.next_run = {}
+        self.running = {}
+        self.stopping = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=max(len(self.jobs), 1), thread_name_prefix="job")
+
+    def try_lead(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", [LEADER_LOCK])
+            return cursor.fetchone()[0]
+
+    def resign(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", [LEADER_LOCK])
+
+    def drain(self):
+        """Wait for the running jobs, then start over with a fresh pool."""
+        self.executor.shutdown(wait=True)
+        self.executor = ThreadPoolExecutor(max_workers=max(len(self.jobs), 1), thread_name_prefix="job")
+        self.running = {}
+
+    def step_down(self):
+        """Leave the lead after the connection dropped, once the jobs still running have finished.
+
+        The lock went with the connection. It is taken back if no other process got it first and
+        held while the jobs finish, so a new leader neither starts them again nor marks them abandoned.
+        """
+        try:
+            held = self.try_lead()
+        except (InterfaceError, OperationalError):
+            connection.close()
+            held = False
+        self.drain()
+        if held:
+            with suppress(InterfaceError, OperationalError):
+                self.resign()
+
+    def take_over(self):
+        """Pick up the schedule where the previous leader left it."""
+        now = timezone.now()
+        # nobody can finish these any more
+        abandoned = JobRun.objects.filter(status=JobRun.STATUS_RUNNING).update(
+            status=JobRun.STATUS_ABANDONED, finished_at=now
+        )
+        if abandoned:
+            logger.warning("%s: marked %s runs of the previous leader abandoned", self.name, abandoned)
+        for name, (_, interval) in self.jobs.items():
+            last = (
+                JobRun.objects.filter(job=name).exclude(status=JobRun.STATUS_SKIPPED)
+                .values_list("started_at", flat=True).first()
+            )
+            self.next_run[name] = last + interval if last else now
+
+    def run_due(self):
+        now = timezone.now()
+        for name, (func, interval) in self.jobs.items():
+            if now < self.next_run[name]:
+                continue
+            self.next_run[name] = now + interval
+
+            previous = self.running.get(name)
+            if previous is not None and not previous.done():
+                JobRun.objects.create(
+                    job=name, status=JobRun.STATUS_SKIPPED, runner=self.name, finished_at=now, duration=0
+                )
+                logger.warning("%s: skipped %s, the previous run is still going", self.name, name)
+                continue
+
+            run = JobRun.objects.create(job=name, runner=self.name)
+            self.running[name] = self.executor.submit(self.execute, run, func, interval)
+
+    def execute(self, run, func, interval):
+        start = time.perf_counter()
+        try:
+            result = func()
+        except Exception:
+            run.status = JobRun.STATUS_FAILED
+            run.error = traceback.format_exc()
+            logger.exception("%s: job %s failed", self.name, run.job)
+        else:
+            run.status = JobRun.STATUS_SUCCEEDED
+            run.result = "" if result is None else str(result)
+        run.duration = time.perf_counter() - start
+        run.finished_at = timezone.now()
+        run.overran = run.duration > interval.total_seconds()
+        if run.overran:
+            logger.warning("%s: job %s took %.1fs, longer than its %s interval", self.name, run.job, run.duration, interval)
+        try:
+            run.save(update_fields=["status", "result", "error", "duration", "finished_at", "overran"])
+        finally:
+            # the connections of this pool thread, the next job may run on another one
+            connections.close_all()
+
+    def lead(self):
+        self.take_over()
+        while not self.stopping.is_set():
+            self.run_due()
+            self.stopping.wait(self.tick)
+
+    def run(self):
+        while not self.stopping.is_set():
+            try:
+                if not self.try_lead():
+                    self.stopping.wait(self.standby_interval)
+                    continue
+                logger.info("%s is the job leader", self.name)
+                self.lead()
+                self.executor.shutdown(wait=True)
+                self.resign()
+            except (InterfaceError, OperationalError):
+                # losing the connection released the lock, and with it the leadership
+                logger.exception("%s: database connection lost", self.name)
+                connection.close()
+                self.step_down()
+                self.stopping.wait(self.standby_interval)
+
+    def stop(self):
+        self.stopping.set()
@@ -0,0 +1,53 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from django.utils.html import escape
+
+from .models import Post
+
+
+
+# ts_headline() does not escape the text around its markers: it marks matches with these
+# control characters, snippet_html() escapes the rest and only then turns them into <mark>
+HIGHLIGHT_START = "\x02"
+HIGHLIGHT_STOP = "\x03"
+
+
+def search_config():
+    return getattr(settings, "POST_SEARCH_CONFIG", "english")
+
+
+def post_search_vector():
+    """Title matches (weight A) rank above content matches (weight B)."""
+    config = search_config()
+    return SearchVector("title", weight="A", config=config) + SearchVector("content", weight="B", config=config)
+
+
+def update_search_vectors(post_ids=None):
+    """Recompute Post.search_vector in one UPDATE. ``None`` means every post."""
+    posts = Post.objects.all() if post_ids is None else Post.objects.filter(pk__in=post_ids)
+    return posts.update(search_vector=post_search_vector())
+
+
+def search_posts(queryset, terms):
+    """Filter on the GIN-indexed vector and annotate ``search_rank`` and a highlighted ``search_snippet``."""
+    config = search_config()
+    query = SearchQuery(terms, search_type="websearch", config=config)
+    return queryset.filter(search_vector=query).annotate(
+        # ts_rank() returns a float4; as float8 the value survives the round trip through a cursor token
+        search_rank=Cast(SearchRank(F("search_vector"), query), FloatField()),
+        search_snippet=SearchHeadline(
+            "content",
+            query,
+            config=config,
+            start_sel=HIGHLIGHT_START,
+            stop_sel=HIGHLIGHT_STOP,
+            max_fragments=2,
+        ),
+    )
+
+
+def snippet_html(snippet):
+    """The search_snippet annotation as HTML: post content escaped, matches in ``<mark>``."""
+    return escape(snippet).replace(HIGHLIGHT_START, "<mark>").replace(HIGHLIGHT_STOP, "</mark>")
@@ -0,0 +1,357 @@
+import bisect
+import itertools
+import math
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from .cache import invalidate
+from .counters import refresh_post_counters, refresh_tag_counters, refresh_author_stats
+from .models import Post, Tag, Comment
+from .search import update_search_vectors
+
+
+
+WORDS = (
+    "django rest framework api python query index cache postgres serializer view model "
+    "pagination cursor keyset signal migration tag comment author benchmark latency throughput "
+    "database transaction async worker queue search rank vector filter ordering prefetch select "
+    "related batch bulk insert update delete scale shard replica lock snapshot profile memory "
+    "request response header token session middleware router endpoint schema deploy release"
+).split()
+
+# keeps a bulk INSERT under PostgreSQL's 65535 bind parameters when COPY is not available
+INSERT_BATCH_SIZE = 10000
+
+# dataset shapes shared by seed_dataset and the benchmarks
+PROFILES = {
+    "small": {
+        "users": 20, "tags": 50, "posts": 1000, "comments": 5000,
+        "tags_per_post": 3, "likes_per_post": 3, "reply_ratio": 0.4, "max_depth": 4,
+    },
+    "medium": {
+        "users": 200, "tags": 500, "posts": 50000, "comments": 250000,
+        "tags_per_post": 3, "likes_per_post": 5, "reply_ratio": 0.4, "max_depth": 5,
+    },
+    "large": {
+        "users": 2000, "tags": 2000, "posts": 1000000, "comments": 5000000,
+        "tags_per_post": 4, "likes_per_post": 8, "reply_ratio": 0.5, "max_depth": 6,
+    },
+    "xl": {
+        "users": 20000, "tags": 10000, "posts": 10000000, "comments": 50000000,
+        "tags_per_post": 4, "likes_per_post": 10, "reply_ratio": 0.5, "max_depth": 8,
+    },
+}
+
+
+def seed_chunk_size():
+    return getattr(settings, "SEED_CHUNK_SIZE", 5000)
+
+
+def ensure_tags(names):
+    """Create the missing tags in one INSERT ... ON CONFLICT DO NOTHING and return ``{name: id}``."""
+    Tag.objects.bulk_create([Tag(name=name) for name in names], ignore_conflicts=True, batch_size=INSERT_BATCH_SIZE)
+    ids = dict(Tag.objects.filter(name__in=names).values_list("name", "pk"))
+    # in the order of ``names``, so a seed picks the same tags whatever order the rows come back in
+    return {name: ids[name] for name in names if name in ids}
+
+
+def ensure_users(count, prefix="Seeduser"):
+    """Create ``prefix1`` .. ``prefixN`` authors that do not exist yet and return their ids.
+
+    bulk_create skips users.signals, so the names are already capitalized and the
+    passwords unusable.
+    """
+    User = get_user_model()
+    usernames = [f"{prefix}{i}" for i in range(1, count + 1)]
+    password = make_password(None)
+    User.objects.bulk_create(
+        [
+            User(username=username, email=f"{username.lower()}@example.com", password=password, role=User.ROLE_AUTHOR)
+            for username in usernames
+        ],
+        ignore_conflicts=True,
+        batch_size=INSERT_BATCH_SIZE,
+    )
+    ids = dict(User.objects.filter(username__in=usernames).values_list("username", "pk"))
+    return [ids[username] for username in usernames if username in ids]
+
+
+def zipf_cum_weights(n, exponent=1.1):
+    """Cumulative Zipf weights: item ``i`` is picked ``(i + 1) ** -exponent`` times as often as the first."""
+    return list(itertools.accumulate((rank ** -exponent for rank in range(1, n + 1))))
+
+
+def poisson(rng, mean):
+    # Knuth's method; the means used here are small
+    if mean <= 0:
+        return 0
+    limit, k, p = math.exp(-mean), 0, rng.random()
+    while p > limit:
+        k += 1
+        p *= rng.random()
+    return k
+
+
+def pick_distinct(rng, population, cum_weights, k):
+    """Up to ``k`` distinct items, popular ones first in line."""
+    k = min(k, len(population))
+    picked = set()
+    for _ in range(k * 4):
+        if len(picked) >= k:
+            break
+        picked.add(population[bisect.bisect(cum_weights, rng.random() * cum_weights[-1])])
+    return picked
+
+
+def sentence(rng, low, high):
+    return " ".join(rng.choices(WORDS, k=rng.randint(low, high)))
+
+
+def share(total, parts, index):
+    """Split ``total`` into ``parts`` integers that differ by at most one; return part ``index``."""
+    return total // parts + (1 if index < total % parts else 0)
+
+
+def can_copy():
+    return connection.vendor == "postgresql"
+
+
+def copy_rows(model, columns, rows):
+    """Stream ``rows`` into the model's table with PostgreSQL COPY."""
+    quote = connection.ops.quote_name
+    sql = f"COPY {quote(model._meta.db_table)} ({', '.join(quote(column) for column in columns)}) FROM STDIN"
+    written = 0
+    with connection.cursor() as cursor:
+        with cursor.cursor.copy(sql) as copy:
+            for row in rows:
+                copy.write_row(row)
+                written += 1
+    return written
+
+
+def reserve_ids(model, count):
+    """Draw ``count`` ids from the table's sequence so rows can be COPYed with their keys."""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+            [table, model._meta.pk.column, count],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def insert_posts(rows, use_copy):
+    """Insert ``(author_id, title, content)`` rows and return the new post ids in order."""
+    if not use_copy:
+        posts = Post.objects.bulk_create(
+            [Post(author_id=author_id, title=title, content=content) for author_id, title, content in rows],
+            batch_size=INSERT_BATCH_SIZE,
+        )
+        return [post.pk for post in posts]
+
+    ids = reserve_ids(Post, len(rows))
+    now = timezone.now()
+    copy_rows(
+        Post,
+        ("id", "author_id", "title", "content", "created_at", "updated_at", "comment_count", "like_count",
+         "image_variants"),
+        # no image, so no variants to queue: '{}' like the field default, not NULL
+        ((post_id, *row, now, now, 0, 0, "{}") for post_id, row in zip(ids, rows)),
+    )
+    return ids
+
+
+def insert_comments(rows, use_copy):
+    """Insert ``(post_id, author_id, content, parent_index)`` rows, replies after their parent.
+
+    ``parent_index`` points at an earlier row. With COPY the ids are reserved up front so a
+    thread goes in with a single statement; bulk_create needs one pass per thread depth.
+    """
+    now = timezone.now()
+    if use_copy:
+        ids = reserve_ids(Comment, len(rows))
+        return copy_rows(
+            Comment,
+            ("id", "post_id", "author_id", "content", "parent_id", "created_at"),
+            (
+                (ids[i], post_id, author_id, content, None if parent is None else ids[parent], now)
+                for i, (post_id, author_id, content, parent) in enumerate(rows)
+            ),
+        )
+
+    ids = [None] * len(rows)
+    pending = list(range(len(rows)))
+    while pending:
+        ready = [i for i in pending if rows[i][3] is None or ids[rows[i][3]] is not None]
+        comments = Comment.objects.bulk_create(
+            [
+                Comment(
+                    post_id=rows[i][0],
+                    author_id=rows[i][1],
+                    content=rows[i][2],
+                    parent_id=None if rows[i][3] is None else ids[rows[i][3]],
+                )
+                for i in ready
+            ],
+            batch_size=INSERT_BATCH_SIZE,
+        )
+        for i, comment in zip(ready, comments):
+            ids[i] = comment.pk
+        pending = [i for i in pending if ids[i] is None]
+    return len(rows)
+
+
+def insert_rows(model, columns, rows, use_copy):
+    if use_copy:
+        return copy_rows(model, columns, rows)
+    objects = [model(**dict(zip(columns, row))) for row in rows]
+    model.objects.bulk_create(objects, batch_size=INSERT_BATCH_SIZE)
+    return len(objects)
+
+
+def seed_chunk(plan, index):
+    """Create one chunk of posts with their tag links and comments in a single transaction.
+
+    On PostgreSQL every table is filled with COPY, elsewhere with chunked bulk_create. The random
+    stream depends only on ``plan["seed"]`` and the chunk index, so the generated data is the
+    same whatever the number of workers. Returns ``(posts, rows)`` written.
+    """
+    rng = random.Random(f"{plan['seed']}:{index}")
+    posts_in_chunk = min(plan["chunk_size"], plan["total_posts"] - index * plan["chunk_size"])
+    comments_in_chunk = share(plan["total_comments"], plan["chunks"], index)
+
+    authors, tags = plan["author_ids"], plan["tag_ids"]
+    author_weights = zipf_cum_weights(len(authors))
+    tag_weights = zipf_cum_weights(len(tags))
+
+    with transaction.atomic():
+        post_ids = insert_posts(
+            [
+                (
+                    authors[bisect.bisect(author_weights, rng.random() * author_weights[-1])],
+                    sentence(rng, 3, 8).capitalize(),
+                    sentence(rng, 20, 120),
+                )
+                for _ in range(posts_in_chunk)
+            ],
+            plan["use_copy"],
+        )
+
+        links = [
+            (post_id, tag_id)
+            for post_id in post_ids
+            for tag_id in sorted(pick_distinct(rng, tags, tag_weights, poisson(rng, plan["tags_per_post"])))
+        ]
+        rows = len(post_ids) + insert_rows(Post.tags.through, ("post_id", "tag_id"), links, plan["use_copy"])
+
+        if plan["likes_per_post"]:
+            likes = [
+                (post_id, user_id)
+                for post_id in post_ids
+                for user_id in sorted(pick_distinct(rng, authors, author_weights, poisson(rng, plan["likes_per_post"])))
+            ]
+            rows += insert_rows(Post.likes.through, ("post_id", "user_id"), likes, plan["use_copy"])
+
+        # long-tailed: most posts get a few comments, a handful get most of them
+        popularity = list(itertools.accumulate(rng.lognormvariate(0, 1.5) for _ in post_ids))
+        comments = []
+        threads = {}
+        for _ in range(comments_in_chunk if post_ids else 0):
+            post_id = post_ids[bisect.bisect(popularity, rng.random() * popularity[-1])]
+            parent = depth = None
+            if plan["reply_ratio"] and threads.get(post_id) and rng.random() < plan["reply_ratio"]:
+                parent, depth = rng.choice(threads[post_id])
+            comments.append((
+                post_id,
+                authors[bisect.bisect(author_weights, rng.random() * author_weights[-1])],
+                sentence(rng, 5, 40),
+                parent,
+            ))
+            depth = 0 if depth is None else depth + 1
+            if depth < plan["max_depth"]:
+                threads.setdefault(post_id, []).append((len(comments) - 1, depth))
+        rows += insert_comments(comments, plan["use_copy"])
+
+        # COPY and bulk_create skip the signals that maintain these
+        refresh_post_counters(post_ids)
+        update_search_vectors(post_ids)
+    return posts_in_chunk, rows
+
+
+def _init_worker():
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+
+def _run_chunk(plan, index):
+    try:
+        return seed_chunk(plan, index)
+    finally:
+        connections.close_all()
+
+
+def seed_posts(total_posts, total_comments, tag_ids, author_ids=None, tags_per_post=3.0, likes_per_post=0,
+               reply_ratio=0, max_depth=0, seed=None, workers=1, chunk_size=None, use_copy=None, progress=None):
+    """Insert ``total_posts`` posts, their tag links and likes and ``total_comments`` comments.
+
+    A ``reply_ratio`` share of the comments answer an earlier comment on the same post, down to
+    ``max_depth`` levels of nesting.
+
+    Work is split into chunks of ``chunk_size`` posts, each written in its own transaction,
+    optionally by ``workers`` processes. ``progress(posts_done, rows_done, elapsed)`` is
+    called after every chunk. Returns ``(seed, posts, rows, elapsed)``.
+    """
+    if author_ids is None:
+        author_ids = list(get_user_model().objects.order_by("pk").values_list("pk", flat=True))
+    if not author_ids:
+        raise ValueError("No users to author the posts")
+
+    chunk_size = chunk_size or seed_chunk_size()
+    plan = {
+        "seed": random.randrange(2 ** 32) if seed is None else seed,
+        "total_posts": total_posts,
+        "total_comments": total_comments,
+        "chunk_size": chunk_size,
+        "chunks": max(1, math.ceil(total_posts / chunk_size)),
+        "author_ids": list(author_ids),
+        "tag_ids": list(tag_ids),
+        "tags_per_post": tags_per_post if tag_ids else 0,
+        "likes_per_post": likes_per_post,
+        "reply_ratio": reply_ratio,
+        "max_depth": max_depth,
+        "use_copy": can_copy() if use_copy is None else use_copy,
+    }
+
+    start = time.perf_counter()
+    done_posts = done_rows = 0
+    if workers <= 1 or plan["chunks"] == 1:
+        for index in range(plan["chunks"]):
+            posts, rows = seed_chunk(plan, index)
+            done_posts, done_rows = done_posts + posts, done_rows + rows
+            if progress:
+                progress(done_posts, done_rows, time.perf_counter() - start)
+    else:
+        # forked workers must not share the parent's socket
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(_run_chunk, plan, index) for index in range(plan["chunks"])]
+            for future in as_completed(futures):
+                posts, rows = future.result()
+                done_posts, done_rows = done_posts + posts, done_rows + rows
+                if progress:
+                    progress(done_posts, done_rows, time.perf_counter() - start)
+
+    refresh_tag_counters(plan["tag_ids"])
+    refresh_author_stats(plan["author_ids"])
+    invalidate("posts")
+    return plan["seed"], done_posts, done_rows, time.perf_counter() - start
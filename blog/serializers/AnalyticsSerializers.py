@@ -0,0 +1,43 @@
+from rest_framework import serializers
+
+from ..models import AuthorStats, Post, Tag
+
+
+
+class AuthorStatsSerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source="author.username", read_only=True)
+    total_posts = serializers.IntegerField(source="post_count", read_only=True)
+    post_titles = serializers.SerializerMethodField()
+
+    class Meta:
+        model = AuthorStats
+        fields = ("username", "total_posts", "post_titles")
+
+    def get_post_titles(self, stats):
+        return [post.title for post in stats.author.recent_posts]
+
+
+class PostStatsSerializer(serializers.ModelSerializer):
+    total_comments = serializers.IntegerField(source="comment_count", read_only=True)
+    comment_texts = serializers.SerializerMethodField()
+    latest_comment = serializers.CharField(source="latest_comment.content", read_only=True, allow_null=True)
+    has_comments = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = Post
+        fields = ("title", "total_comments", "comment_texts", "latest_comment", "has_comments")
+
+    def get_comment_texts(self, post):
+        return [comment.content for comment in post.recent_comments]
+
+
+class TagStatsSerializer(serializers.ModelSerializer):
+    total_posts = serializers.IntegerField(source="post_count", read_only=True)
+    post_titles = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Tag
+        fields = ("name", "total_posts", "post_titles")
+
+    def get_post_titles(self, tag):
+        return [post.title for post in tag.recent_posts]
@@ -28,4 +28,18 @@ class CommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = ("id", "author", "content", "created_at")
-        read_only_fields = ()
\ No newline at end of file
+        read_only_fields = ()
+
+
+class CommentThreadSerializer(CommentSerializer):
+    """A comment with its replies nested, as loaded by blog.threads.comment_threads()."""
+    depth = serializers.IntegerField(read_only=True)
+    replies = serializers.SerializerMethodField()
+    # there are replies below the depth limit or past the replies limit, left out
+    more_replies = serializers.BooleanField(read_only=True)
+
+    class Meta(CommentSerializer.Meta):
+        fields = CommentSerializer.Meta.fields + ("parent", "depth", "replies", "more_replies")
+
+    def get_replies(self, comment):
+        return CommentThreadSerializer(comment.thread_replies, many=True, context=self.context).data
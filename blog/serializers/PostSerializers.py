@@ -1,37 +1,88 @@
+from django.db import models
 from rest_framework import serializers
+from rest_framework.reverse import reverse
+from ..likes import liked_post_ids
 from ..models import Post, Tag
+from ..search import snippet_html
 from .CommentSerializers import CommentSerializer
 from .TagSerializers import TagSerializer
 
+from drf_practice.images import ImageVariantsField, set_image
+
+
+
+class PostListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        # liked_by_me of the whole page in one query
+        self.context["liked_post_ids"] = liked_post_ids(
+            getattr(self.context.get("request"), "user", None), [post.pk for post in posts]
+        )
+        return super().to_representation(posts)
+
+
+class SearchSnippetField(serializers.CharField):
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return snippet_html(super().to_representation(value))
 
 
 class PostSerializer(serializers.ModelSerializer):
     author = serializers.SlugRelatedField(read_only=True, slug_field='username')
-    comments = CommentSerializer(many=True, read_only=True)
+    comments = serializers.SerializerMethodField()
+    comments_url = serializers.SerializerMethodField()
     tags = TagSerializer(many=True, read_only=True)
+    image_variants = ImageVariantsField()
     tag_ids = serializers.PrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True,
         source="tags"
     )
 
-    # analytics fields
+    # analytics fields (counters are denormalized columns on Post)
     comment_count = serializers.IntegerField(read_only=True)
+    like_count = serializers.IntegerField(read_only=True)
+    liked_by_me = serializers.SerializerMethodField()
     has_image = serializers.BooleanField(read_only=True)
     has_comments = serializers.BooleanField(read_only=True)
-    latest_comment = serializers.CharField(read_only=True)
+    latest_comment = serializers.CharField(source="latest_comment.content", read_only=True, allow_null=True)
     doubled_title_len = serializers.IntegerField(read_only=True)
+    # only present on ?search= results
+    search_rank = serializers.FloatField(read_only=True)
+    search_snippet = SearchSnippetField()
 
     class Meta:
         model = Post
-        fields = ("id", "author", "title", "content", "image", "tags", "tag_ids", "comments", "created_at", "comment_count", 
-                  "has_image", "has_comments", "latest_comment", "doubled_title_len",)
+        fields = ("id", "author", "title", "content", "image", "image_variants", "tags", "tag_ids", "comments", "comments_url", "created_at", "comment_count", 
+                  "like_count", "liked_by_me", "has_image", "has_comments", "latest_comment", "doubled_title_len", "search_rank", "search_snippet",)
         read_only_fields = ["author"]
+        list_serializer_class = PostListSerializer
+
+    def get_comments(self, post):
+        # views in preview mode attach the latest few comments as `comment_preview`
+        comments = getattr(post, "comment_preview", None)
+        if comments is None:
+            comments = post.comments.all()
+        return CommentSerializer(comments, many=True, context=self.context).data
+
+    def get_liked_by_me(self, post):
+        liked = self.context.get("liked_post_ids")
+        if liked is None:
+            liked = liked_post_ids(getattr(self.context.get("request"), "user", None), [post.pk])
+        return post.pk in liked
+
+    def get_comments_url(self, post):
+        return reverse("post-comments", kwargs={"pk": post.pk}, request=self.context.get("request"))
 
     def create(self, validated_data):
         tags = validated_data.pop("tags", ())
         request = self.context.get("request")
         user = request.user if request and request.user.is_authenticated else None
+        if validated_data.get("image"):
+            validated_data["image_variants"] = None
         post = Post.objects.create(author=user, **validated_data)
         if tags:
             post.tags.set(tags)
@@ -39,9 +90,22 @@ class PostSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         tags = validated_data.pop("tags", None)
+        if "image" in validated_data:
+            set_image(instance, "image", validated_data.pop("image"))
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
         if tags is not None:
             instance.tags.set(tags)
         return instance
+
+
+class PostBulkItemSerializer(serializers.ModelSerializer):
+    """One element of a bulk create/update payload; tag ids are checked for the whole batch at once."""
+    id = serializers.IntegerField(required=False)
+    tag_ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+
+    class Meta:
+        model = Post
+        fields = ("id", "title", "content", "tag_ids")
+
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 
-from ..models import Tag, Comment, Post
+from ..models import Tag, Comment
 
 
 
@@ -14,21 +14,7 @@ class CommentSerializer(serializers.ModelSerializer):
 
 
 class TagSerializer(serializers.ModelSerializer):
-    comments = serializers.SerializerMethodField()
-
     class Meta:
         model = Tag
-        fields = ("id", "name", "comments")
-
-
-    def get_comments(self, tag):
-        comments = set()
-
-        for post in tag.posts.all():
-            for comment in post.comments.all():
-                comments.add(comment)
-
-        return CommentSerializer(list(comments), many=True, context=self.context).data
-
-  
-
+        fields = ("id", "name", "post_count")
+        read_only_fields = ("post_count",)
@@ -1,4 +1,5 @@
 from .GeneralSerializers import BasicPostSerializer
-from .PostSerializers import PostSerializer
-from .CommentSerializers import CommentSerializer
+from .PostSerializers import PostSerializer, PostBulkItemSerializer
+from .CommentSerializers import CommentSerializer, CommentThreadSerializer
 from .TagSerializers import TagSerializer
+from .AnalyticsSerializers import AuthorStatsSerializer, PostStatsSerializer, TagStatsSerializer
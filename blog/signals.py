@@ -0,0 +1,201 @@
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from drf_practice.images import variants_rendered
+
+from .models import Post, Comment, Tag, FeedEntry, post_soft_deleted
+from .cache import invalidate
+from .search import update_search_vectors
+from .storage import blob_names, instance_blob_names, retain, release, stored_file_columns
+from .counters import (record_comment_added, record_comment_removed, refresh_like_counts, refresh_tag_counters,
+                       record_post_authored, touch_posts, refresh_follower_counts, refresh_tag_follower_counts)
+from .feed import (push_to_author_followers, push_to_tag_followers, backfill_authors, backfill_tags, drop_authors,
+                   drop_tags)
+
+
+
+def _counted_ids(instance, action, pk_set, counted_side, clear_accessor):
+    """Ids of the rows whose counter an m2m change affects.
+
+    ``counted_side`` is True when ``instance`` itself carries the counter
+    (post.likes.add -> the post), False when the other end does (post.tags.add -> the tags).
+    """
+    if action == "pre_clear":
+        # clear() does not report which rows it removed, so remember them first
+        if not counted_side:
+            instance._cleared_m2m_ids = list(getattr(instance, clear_accessor).values_list("pk", flat=True))
+        return []
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return []
+
+    if counted_side:
+        return [instance.pk] if (pk_set or action == "post_clear") else []
+    if action == "post_clear":
+        return getattr(instance, "_cleared_m2m_ids", [])
+    return list(pk_set or ())
+
+
+@receiver(post_save, sender=Comment)
+def comment_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_comment_added(instance)
+    elif not raw:
+        # an edited comment changes its post's payload (ETag / Last-Modified)
+        touch_posts([instance.post_id])
+    invalidate(f"post:{instance.post_id}")
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    record_comment_removed(instance)
+    invalidate(f"post:{instance.post_id}")
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    invalidate(f"tag:{instance.pk}")
+
+
+@receiver(post_save, sender=get_user_model())
+def author_changed(sender, instance, **kwargs):
+    invalidate(f"author:{instance.pk}")
+
+
+@receiver(m2m_changed, sender=Post.likes.through)
+def post_likes_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    post_ids = _counted_ids(instance, action, pk_set, counted_side=not reverse, clear_accessor="liked_posts")
+    if post_ids:
+        refresh_like_counts(post_ids)
+        invalidate(*(f"post:{post_id}" for post_id in post_ids))
+
+
+@receiver(m2m_changed, sender=Post.tags.through)
+def post_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    tag_ids = _counted_ids(instance, action, pk_set, counted_side=reverse, clear_accessor="tags")
+    # the tagged posts' payloads changed too (ETag validators)
+    post_ids = _counted_ids(instance, action, pk_set, counted_side=not reverse, clear_accessor="posts")
+    if tag_ids:
+        refresh_tag_counters(tag_ids)
+        # tag filters on the feeds may now match different posts
+        invalidate("posts")
+    if post_ids:
+        touch_posts(post_ids)
+    if action == "post_add" and post_ids and tag_ids:
+        push_to_tag_followers(post_ids, tag_ids)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    loaded_author_id = None if created else getattr(instance, "_loaded_author_id", instance.author_id)
+    if loaded_author_id != instance.author_id:
+        record_post_authored(loaded_author_id, -1)
+        record_post_authored(instance.author_id, +1)
+    instance._loaded_author_id = instance.author_id
+    if created:
+        push_to_author_followers([instance.pk])
+
+    update_fields = kwargs.get("update_fields")
+    if update_fields is None or {"title", "content"} & set(update_fields):
+        update_search_vectors([instance.pk])
+    # any edit can change which filtered/searched lists the post belongs to
+    invalidate("posts", f"post:{instance.pk}")
+
+
+@receiver(pre_delete, sender=Post)
+def remember_post_tags(sender, instance, **kwargs):
+    # the delete collector removes through rows without sending m2m_changed
+    instance._deleted_tag_ids = list(instance.tags.values_list("pk", flat=True))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    # a soft-deleted post already left its author's count
+    if instance.deleted_at is None:
+        record_post_authored(instance.author_id, -1)
+    invalidate("posts", f"post:{instance.pk}")
+    tag_ids = getattr(instance, "_deleted_tag_ids", None)
+    if tag_ids:
+        refresh_tag_counters(tag_ids)
+
+
+@receiver(post_soft_deleted, sender=Post)
+def posts_soft_deleted(sender, post_ids, author_ids, **kwargs):
+    for author_id, count in Counter(author_ids).items():
+        record_post_authored(author_id, -count)
+    tag_ids = list(Post.tags.through.objects.filter(post_id__in=post_ids).values_list("tag_id", flat=True).distinct())
+    if tag_ids:
+        refresh_tag_counters(tag_ids)
+    invalidate("posts", *(f"post:{post_id}" for post_id in post_ids))
+    FeedEntry.objects.filter(post_id__in=post_ids).delete()
+
+
+@receiver(m2m_changed, sender=get_user_model().following.through)
+def following_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    author_ids = _counted_ids(instance, action, pk_set, counted_side=reverse, clear_accessor="following")
+    follower_ids = _counted_ids(instance, action, pk_set, counted_side=not reverse, clear_accessor="followers")
+    if not author_ids or not follower_ids:
+        return
+    refresh_follower_counts(author_ids)
+    if action == "post_add":
+        backfill_authors(follower_ids, author_ids)
+    else:
+        drop_authors(follower_ids, author_ids)
+
+
+@receiver(m2m_changed, sender=Tag.followers.through)
+def tag_followers_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    tag_ids = _counted_ids(instance, action, pk_set, counted_side=not reverse, clear_accessor="followed_tags")
+    follower_ids = _counted_ids(instance, action, pk_set, counted_side=reverse, clear_accessor="followers")
+    if not tag_ids or not follower_ids:
+        return
+    refresh_tag_follower_counts(tag_ids)
+    if action == "post_add":
+        backfill_tags(follower_ids, tag_ids)
+    else:
+        drop_tags(follower_ids, tag_ids)
+
+
+# blob reference counts of every model with stored_file_fields (see blog.storage)
+
+@receiver(pre_save)
+def remember_stored_files(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not getattr(sender, "stored_file_fields", None):
+        return
+    columns = stored_file_columns(sender)
+    if instance._state.adding:
+        instance._stored_blobs = Counter()
+    elif update_fields is not None and not set(columns) & set(update_fields):
+        instance._stored_blobs = None
+    else:
+        # what the row points at now, the instance may already hold new files; locked until the
+        # save commits (StoredFilesModelMixin), or a concurrent save would release the same blobs
+        row = sender._base_manager.select_for_update().filter(pk=instance.pk).values(*columns).first()
+        instance._stored_blobs = blob_names(sender, row) if row else Counter()
+
+
+@receiver(post_save)
+def update_stored_file_references(sender, instance, raw=False, **kwargs):
+    old = getattr(instance, "_stored_blobs", None)
+    if raw or old is None or not getattr(sender, "stored_file_fields", None):
+        return
+    new = instance_blob_names(instance)
+    retain(new - old)
+    release(old - new)
+    instance._stored_blobs = None
+
+
+@receiver(post_delete)
+def release_stored_files(sender, instance, **kwargs):
+    if getattr(sender, "stored_file_fields", None):
+        release(instance_blob_names(instance))
+
+
+@receiver(variants_rendered)
+def variants_stored(sender, pk, names, **kwargs):
+    retain(names.values())
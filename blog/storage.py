@@ -0,0 +1,142 @@
+import hashlib
+import os
+import uuid
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest, Now
+from django.utils import timezone
+from django.views.static import serve
+
+from .models import MediaBlob
+
+
+
+# every content-addressed file lives under it, older uploads keep their images/ and profiles/ names
+BLOB_PREFIX = "blobs/"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Stores a file once, under the SHA-256 of its bytes: ``blobs/ab/cd/<sha256><ext>``.
+
+    The name asked for only contributes its extension, so identical uploads share one file,
+    whatever field they were made to. Saving content that is already stored writes nothing.
+    A blob never changes under its name, which makes its URL cacheable forever. Files are
+    not deleted one by one: rows reference-count their blobs (blog.signals) and
+    collect_garbage() removes the ones nothing has pointed at for a while.
+    """
+
+    def content_name(self, name, content):
+        # HashingTemporaryFileUploadHandler hashed uploads while they streamed in
+        digest = getattr(content, "sha256", None)
+        if digest is None:
+            sha256 = hashlib.sha256()
+            for chunk in content.chunks():
+                sha256.update(chunk)
+            digest = sha256.hexdigest()
+            content.seek(0)
+        extension = os.path.splitext(name)[1].lower()
+        return f"{BLOB_PREFIX}{digest[:2]}/{digest[2:4]}/{digest}{extension}"
+
+    def get_available_name(self, name, max_length=None):
+        # the same content gets the same name, see _save()
+        return name
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        # claimed before the file is looked at: this waits for a collection of the blob in
+        # progress and restarts its grace period, so the file cannot go away under the new row
+        MediaBlob.objects.bulk_create(
+            [MediaBlob(name=name, size=content.size, touched_at=timezone.now())],
+            update_conflicts=True, unique_fields=["name"], update_fields=["touched_at"],
+        )
+        if self.exists(name):
+            return name
+        # written aside and renamed, so a concurrent save of the same bytes never sees half a file
+        partial = super()._save(f"{name}.{uuid.uuid4().hex}.part", content)
+        os.replace(self.path(partial), self.path(name))
+        return name
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """django.views.static.serve, with blobs marked immutable."""
+    response = serve(request, path, document_root=document_root, show_indexes=show_indexes)
+    if path.startswith(BLOB_PREFIX):
+        response["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+
+def stored_file_columns(model):
+    """Columns of ``model`` that hold blob names: each of its stored_file_fields and their variants."""
+    return [column for field in model.stored_file_fields for column in (field, f"{field}_variants")]
+
+
+def blob_names(model, row):
+    """Names a row points at, from ``{column: value}`` of stored_file_columns()."""
+    names = []
+    for field in model.stored_file_fields:
+        name = row[field]
+        # a FieldFile on an instance, a str from values()
+        names.append(getattr(name, "name", name))
+        names.extend((row[f"{field}_variants"] or {}).values())
+    return Counter(name for name in names if name and name.startswith(BLOB_PREFIX))
+
+
+def instance_blob_names(instance):
+    model = type(instance)
+    return blob_names(model, {column: getattr(instance, column) for column in stored_file_columns(model)})
+
+
+def _add_references(names, sign):
+    counts = names if isinstance(names, Counter) else Counter(names)
+    # one UPDATE per distinct count, usually just one
+    by_count = defaultdict(list)
+    for name, count in counts.items():
+        if name and name.startswith(BLOB_PREFIX) and count > 0:
+            by_count[count].append(name)
+    for count, group in by_count.items():
+        MediaBlob.objects.filter(name__in=group).update(
+            refcount=Greatest(F("refcount") + sign * count, 0), touched_at=Now()
+        )
+
+
+def retain(names):
+    """Count a reference to each of ``names``, an iterable or a Counter; names that are not blobs are ignored."""
+    _add_references(names, +1)
+
+
+def release(names):
+    _add_references(names, -1)
+
+
+def blob_grace_period():
+    return timedelta(hours=getattr(settings, "MEDIA_BLOB_GRACE_HOURS", 24))
+
+
+def collect_garbage(grace=None, batch_size=None):
+    """Delete the blobs no row has referenced for ``grace``, returns how many went.
+
+    The grace period covers uploads saved to storage whose row is not committed yet.
+    Blobs are locked with SKIP LOCKED, so a save of the same bytes waits for the collection
+    of the blob and then writes it again.
+    """
+    cutoff = timezone.now() - (grace if grace is not None else blob_grace_period())
+    batch_size = batch_size or getattr(settings, "MEDIA_BLOB_GC_BATCH_SIZE", 500)
+    removed = 0
+    while True:
+        with transaction.atomic():
+            names = list(
+                MediaBlob.objects.select_for_update(skip_locked=True)
+                .filter(refcount=0, touched_at__lt=cutoff)
+                .values_list("name", flat=True)[:batch_size]
+            )
+            if not names:
+                return removed
+            for name in names:
+                default_storage.delete(name)
+            MediaBlob.objects.filter(name__in=names).delete()
+            removed += len(names)
@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+
+from .models import Comment
+
+
+
+def _sort(comments, ordering):
+    # stable sorts from the last key to the first honour each field's direction
+    for field in reversed(ordering):
+        comments.sort(key=lambda comment: getattr(comment, field.lstrip("-")), reverse=field.startswith("-"))
+    return comments
+
+
+def comment_threads(roots, max_depth, max_replies):
+    """Evaluate ``roots``, a queryset of comments, with their replies ``max_depth`` levels down, in one query.
+
+    A recursive CTE walks ``parent`` from the roots (the queryset may be ordered and sliced, it
+    becomes the anchor subquery), taking the first ``max_replies`` replies of each comment through
+    a LATERAL ... LIMIT on the (parent, created_at, id) index. Returns the roots in the queryset's
+    order, every comment with its replies, oldest first, in ``thread_replies`` and its level in
+    ``depth``; ``more_replies`` tells whether a comment has replies that were left out, below the
+    last level or past ``max_replies``.
+    """
+    comments = connection.ops.quote_name(Comment._meta.db_table)
+    users = connection.ops.quote_name(get_user_model()._meta.db_table)
+    roots_sql, roots_params = roots.values("pk").query.sql_with_params()
+    columns = "c.id, c.post_id, c.parent_id, c.author_id, c.content, c.created_at"
+    sql = f"""
+        WITH RECURSIVE thread AS (
+            SELECT {columns}, 0 AS depth FROM {comments} c WHERE c.id IN ({roots_sql})
+            UNION ALL
+            SELECT {columns}, t.depth + 1 FROM thread t
+            CROSS JOIN LATERAL (
+                SELECT * FROM {comments} r WHERE r.parent_id = t.id ORDER BY r.created_at, r.id LIMIT %s
+            ) c
+            WHERE t.depth < %s
+        )
+        SELECT t.*, u.username AS author_username,
+               EXISTS (
+                   SELECT 1 FROM {comments} r WHERE r.parent_id = t.id
+                   OFFSET CASE WHEN t.depth = %s THEN 0 ELSE %s END
+               ) AS more_replies
+        FROM thread t LEFT JOIN {users} u ON u.id = t.author_id
+        ORDER BY t.depth, t.created_at, t.id
+    """
+    User = get_user_model()
+    nodes = {}
+    top = []
+    for comment in Comment.objects.raw(sql, [*roots_params, max_replies, max_depth, max_depth, max_replies]):
+        if comment.author_id is not None:
+            comment.author = User(pk=comment.author_id, username=comment.author_username)
+        comment.thread_replies = []
+        nodes[comment.pk] = comment
+        # parents come first, they are a level up
+        if comment.depth == 0:
+            top.append(comment)
+        else:
+            nodes[comment.parent_id].thread_replies.append(comment)
+    return _sort(top, roots.query.order_by or Comment._meta.ordering)
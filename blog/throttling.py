@@ -1,6 +1,80 @@
-from rest_framework.throttling import UserRateThrottle
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
 
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
 
+from .models import ThrottleBucket
 
-class TenPerHourUserThrottle(UserRateThrottle):
+
+
+_REFILLED = "LEAST(%(capacity)s, bucket.tokens + (EXCLUDED.checked_at - bucket.checked_at) * %(rate)s)"
+
+TAKE_TOKEN_SQL = f"""
+    INSERT INTO {{table}} AS bucket (key, tokens, checked_at, allowed)
+    VALUES (%(key)s, %(capacity)s - 1, EXTRACT(EPOCH FROM clock_timestamp()), true)
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = {_REFILLED} - CASE WHEN {_REFILLED} >= 1 THEN 1 ELSE 0 END,
+        checked_at = EXCLUDED.checked_at,
+        allowed = {_REFILLED} >= 1
+    RETURNING allowed, tokens
+"""
+
+
+def take_token(key, capacity, duration):
+    """Refill ``key``'s bucket for the time since its last check and take one token if there is one.
+
+    One INSERT ... ON CONFLICT DO UPDATE: the row lock makes concurrent checks from any worker or
+    host apply one after the other. Returns ``(allowed, tokens_left)``.
+    """
+    sql = TAKE_TOKEN_SQL.format(table=connection.ops.quote_name(ThrottleBucket._meta.db_table))
+    with connection.cursor() as cursor:
+        cursor.execute(sql, {"key": key, "capacity": capacity, "rate": capacity / duration})
+        allowed, tokens = cursor.fetchone()
+    return allowed, tokens
+
+
+def purge_idle_buckets(max_idle):
+    """Delete buckets unchecked for ``max_idle`` seconds; a full bucket carries no state worth keeping."""
+    # checked_at is the database's clock, compare it with that one rather than this host's
+    cutoff = RawSQL("EXTRACT(EPOCH FROM now()) - %s", [max_idle], output_field=FloatField())
+    return ThrottleBucket.objects.filter(checked_at__lt=cutoff).delete()[0]
+
+
+class SharedRateThrottleMixin:
+    """Token bucket replacement for SimpleRateThrottle's per-process list of request timestamps.
+
+    ``num_requests`` tokens refill evenly over ``duration``, so the configured rate holds across
+    every worker and host, with bursts of up to ``num_requests``.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        allowed, self.tokens = take_token(self.key, self.num_requests, self.duration)
+        return allowed
+
+    def wait(self):
+        # until one whole token has been refilled
+        return max(0.0, (1 - self.tokens) * self.duration / self.num_requests)
+
+
+class SharedAnonRateThrottle(SharedRateThrottleMixin, AnonRateThrottle):
+    pass
+
+
+class SharedUserRateThrottle(SharedRateThrottleMixin, UserRateThrottle):
+    pass
+
+
+class TenPerHourUserThrottle(SharedUserRateThrottle):
     scope = 'ten_per_hour'
+
+
+class LikeRateThrottle(SharedUserRateThrottle):
+    scope = "likes"
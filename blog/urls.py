@@ -3,7 +3,8 @@ from rest_framework.routers import DefaultRouter
 from django.urls import path, include
 
 from .views import (api_status, PostDetailAPIView, PostListCreateMixins, PostViewSet, CommentViewSet, TagViewSet, PostListAPIView,
-                    PostCreateAPIView, PostRetrieveAPIView, PostUpdateAPIView, PostDeleteAPIView, AnalyticsAPIView, CachedPostListAPIView, )
+                    PostCreateAPIView, PostRetrieveAPIView, PostUpdateAPIView, PostDeleteAPIView, AnalyticsAPIView, CachedPostListAPIView,
+                    AuthorAnalyticsAPIView, PostAnalyticsAPIView, TagAnalyticsAPIView, FeedAPIView, )
 
 
 
@@ -19,7 +20,11 @@ urlpatterns = [
     path("mixins", PostListCreateMixins.as_view(), name="posts-mixins"),
     path("<int:pk>/detail", PostDetailAPIView.as_view(), name="post-detail-apiview"),
     path("cached-posts", CachedPostListAPIView.as_view(), name="cached-posts"),
+    path("feed", FeedAPIView.as_view(), name="feed"),
     path("analytics", AnalyticsAPIView.as_view(), name="analytics"),
+    path("analytics/authors", AuthorAnalyticsAPIView.as_view(), name="analytics-authors"),
+    path("analytics/posts", PostAnalyticsAPIView.as_view(), name="analytics-posts"),
+    path("analytics/tags", TagAnalyticsAPIView.as_view(), name="analytics-tags"),
 
     # CRUD endpoints for generic APIViews
     path("list", PostListAPIView.as_view(), name="post-list"),
@@ -1,57 +1,79 @@
+from rest_framework import generics
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 
-from django.db.models import Count,  OuterRef, Subquery, Exists, Case, When, Value, BooleanField
-from django.contrib.postgres.aggregates import ArrayAgg
+from django.conf import settings
+from django.db.models import Prefetch
 
-from ..models import Post, Comment, Tag
+from ..models import Post, Comment, Tag, AuthorStats
 
-from django.contrib.auth import get_user_model
+from ..serializers import AuthorStatsSerializer, PostStatsSerializer, TagStatsSerializer
 
-User = get_user_model()
+from ..pagination import AuthorStatsPagination, PostStatsPagination, TagStatsPagination
 
 
 
-class AnalyticsAPIView(APIView): 
+class AnalyticsAPIView(APIView):
+    """Index of the analytics sections; each one is paginated on its own."""
+    query_budget = 3
 
     def get(self, request):
-        posts_per_author = (
-            User.objects.annotate(
-                total_posts=Count('post', distinct=True),
-                post_titles=ArrayAgg('post__title', distinct=True)
-            )
-            .values('username', 'total_posts', 'post_titles')
-            .order_by('username')
-        )
+        return Response({
+            "posts_per_author": reverse("analytics-authors", request=request),
+            "comments_per_post": reverse("analytics-posts", request=request),
+            "posts_per_tag": reverse("analytics-tags", request=request),
+        })
+
+
+class AnalyticsSectionMixin:
+    """Serves a section from the rollup columns, embedding at most ``array_cap`` titles/texts per row."""
+    filter_backends = []
+    query_budget = 5
+
+    def get_array_cap(self):
+        default = getattr(settings, "ANALYTICS_ARRAY_CAP", 10)
+        try:
+            cap = int(self.request.query_params.get("array_cap", default))
+        except ValueError:
+            return default
+        return max(0, min(cap, getattr(settings, "ANALYTICS_MAX_ARRAY_CAP", 100)))
+
+    def recent_posts(self):
+        return Post.objects.only("id", "title", "author_id").order_by("-created_at", "-id")[:self.get_array_cap()]
 
-        latest_comment_subquery = Comment.objects.filter(post=OuterRef('pk')).order_by('created_at').values('content')[:1]
-
-        comments_per_post = (
-            Post.objects.select_related('author')  
-                .prefetch_related('comments')   
-                .annotate(
-                    total_comments=Count('comments', distinct=True),
-                    comment_texts=ArrayAgg('comments__content', distinct=True),
-                    latest_comment=Subquery(latest_comment_subquery),
-                    has_comments=Exists(Comment.objects.filter(post=OuterRef('pk'))),
-                )
-                .values('title', 'total_comments', 'comment_texts', 'latest_comment', 'has_comments')
-                .order_by('title')
+
+class AuthorAnalyticsAPIView(AnalyticsSectionMixin, generics.ListAPIView):
+    serializer_class = AuthorStatsSerializer
+    pagination_class = AuthorStatsPagination
+
+    def get_queryset(self):
+        return (
+            AuthorStats.objects.select_related("author")
+            .prefetch_related(Prefetch("author__post_set", queryset=self.recent_posts(), to_attr="recent_posts"))
         )
 
-        posts_per_tag = (
-            Tag.objects.prefetch_related('posts')  
-                .annotate(
-                    total_posts=Count('posts', distinct=True),
-                    post_titles=ArrayAgg('posts__title', distinct=True),
+
+class PostAnalyticsAPIView(AnalyticsSectionMixin, generics.ListAPIView):
+    serializer_class = PostStatsSerializer
+    pagination_class = PostStatsPagination
+
+    def get_queryset(self):
+        recent_comments = Comment.objects.only("id", "content", "post_id").order_by("-created_at", "-id")
+        return (
+            Post.objects.select_related("latest_comment")
+            .only("id", "title", "comment_count", "latest_comment__content")
+            .prefetch_related(
+                Prefetch("comments", queryset=recent_comments[:self.get_array_cap()], to_attr="recent_comments")
             )
-            .values('name', 'total_posts', 'post_titles')
-            .order_by('name')
         )
 
 
-        return Response({
-            "posts_per_author": list(posts_per_author),
-            "comments_per_post": list(comments_per_post),
-            "posts_per_tag": list(posts_per_tag),
-        })
+class TagAnalyticsAPIView(AnalyticsSectionMixin, generics.ListAPIView):
+    serializer_class = TagStatsSerializer
+    pagination_class = TagStatsPagination
+
+    def get_queryset(self):
+        return Tag.objects.prefetch_related(
+            Prefetch("posts", queryset=self.recent_posts(), to_attr="recent_posts")
+        )
@@ -4,48 +4,174 @@ from rest_framework.response import Response
 from rest_framework.parsers import JSONParser, FormParser, MultiPartParser
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 
+import hashlib
+
+from django.contrib.postgres.expressions import ArraySubquery
+from django.core.exceptions import ValidationError
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 
 from django.utils.decorators import method_decorator
 
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.cache import cache_page
-
-from django.db.models import Count, OuterRef, Subquery, Exists, Case, When, Value, BooleanField, F, IntegerField, ExpressionWrapper
-from django.db.models.functions import Length
 
-from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import (Case, When, Value, BooleanField, CharField, F, IntegerField, ExpressionWrapper, OuterRef,
+                              Prefetch)
+from django.db.models.functions import Cast, Concat, Length
 
-from ..models import Post, Comment
+from ..models import Post, Comment, Tag, FeedEntry
 
-from ..serializers import PostSerializer
+from ..serializers import PostSerializer, CommentThreadSerializer
 
 from ..permissions import IsOwnerOrReadOnly
 
-from ..pagination import StandardResultsSetPagination
+from ..pagination import (StandardResultsSetPagination, PostCursorPagination, PostSearchCursorPagination,
+                          CommentThreadPagination, FeedPagination)
 
-from ..throttling import TenPerHourUserThrottle
+from ..throttling import TenPerHourUserThrottle, LikeRateThrottle
 
 from django_filters.rest_framework import DjangoFilterBackend
 
-from ..filters import PostFilter
+from ..filters import PostFilter, PostSearchFilter
+
+from ..cache import CachedListMixin, invalidate
+
+from ..likes import like_post, unlike_post
+
+from ..feed import pull_popular_posts
+
+from ..bulk import bulk_create_posts, bulk_update_posts, max_bulk_items
+
+from ..export import EXPORT_FORMATS, EXPORT_TYPES, export
+
+from drf_practice.images import ImageUploadMixin, check_image, set_image
+
+
 
+class CommentModeMixin:
+    """Lets callers pick how comments are embedded in post payloads with ``?comments=full|preview``.
+
+    ``preview`` embeds only the latest ``comments_limit`` comments of each post, fetched for the
+    whole page in one window-function query; the rest is reachable via ``comments_url``.
+    List endpoints default to preview, detail endpoints to full.
+    """
+    comment_modes = ("full", "preview")
+    comment_preview_size = 3
+    max_comment_preview_size = 20
+    # actions that load a post without serializing its comments
+    actions_without_comments = ("destroy", "comments")
+
+    def get_comments_mode(self):
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        default = "full" if lookup in self.kwargs else "preview"
+        mode = self.request.query_params.get("comments", default)
+        return mode if mode in self.comment_modes else default
+
+    def get_comment_preview_size(self):
+        try:
+            size = int(self.request.query_params.get("comments_limit", self.comment_preview_size))
+        except ValueError:
+            return self.comment_preview_size
+        return max(0, min(size, self.max_comment_preview_size))
+
+    def with_comments(self, queryset):
+        if self.request.method == "DELETE" or getattr(self, "action", None) in self.actions_without_comments:
+            return queryset
+
+        comments = Comment.objects.select_related("author")
+        if self.get_comments_mode() == "full":
+            return queryset.prefetch_related(Prefetch("comments", queryset=comments))
+
+        # a sliced Prefetch becomes a single ROW_NUMBER() OVER (PARTITION BY post_id) query
+        preview = comments.order_by("-created_at", "-id")[:self.get_comment_preview_size()]
+        return queryset.prefetch_related(Prefetch("comments", queryset=preview, to_attr="comment_preview"))
+
+    def get_queryset(self):
+        return self.with_comments(super().get_queryset())
+
+
+class ConditionalRetrieveMixin:
+    """ETag / Last-Modified for post detail endpoints.
+
+    The validators come from one lookup of updated_at, activity_at, the counters and the embedded
+    tags, so If-None-Match / If-Modified-Since polls get a 304 without loading or serializing the post.
+    Comment edits and deletes bump activity_at (blog.signals); tag renames and post_count changes
+    only show up in the tags part of the ETag, Last-Modified does not see them.
+    """
+
+    def get_post_validators(self, request):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        # the tags are serialized with their name and post_count, which change without touching the post
+        tags = (
+            Tag.objects.filter(posts=OuterRef("pk"))
+            .order_by("pk")
+            .annotate(state=Concat(Cast("pk", CharField()), Value(":"), Cast("post_count", CharField()), Value(":"), "name"))
+            .values("state")
+        )
+        try:
+            # the same queryset get_object() would look in, without its joins and prefetches
+            row = (
+                self.filter_queryset(self.get_queryset())
+                .prefetch_related(None)
+                .filter(pk=self.kwargs[lookup_url_kwarg])
+                .annotate(tag_state=ArraySubquery(tags))
+                .values_list("pk", "updated_at", "activity_at", "comment_count", "like_count", "tag_state")
+                .first()
+            )
+        except (ValueError, TypeError, ValidationError):
+            # a malformed key, super().retrieve() turns it into a 404
+            return None
+        if row is None:
+            return None
+        _, updated_at, activity_at, _, _, _ = row
+        last_modified = max(updated_at, activity_at) if activity_at else updated_at
+        # the payload also depends on the query string (?comments=...), the renderer and the user (liked_by_me)
+        fingerprint = f"{row}:{request.query_params.urlencode()}:{request.accepted_media_type}:{request.user.pk}"
+        etag = '"%s"' % hashlib.md5(fingerprint.encode("utf-8")).hexdigest()
+        return etag, int(last_modified.timestamp())
+
+    def retrieve(self, request, *args, **kwargs):
+        validators = self.get_post_validators(request)
+        if validators is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        etag, last_modified = validators
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return response
+
+        response = super().retrieve(request, *args, **kwargs)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        return response
 
 
 @method_decorator(csrf_exempt, name='dispatch')
-class PostDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Post.objects.all()
+class PostDetailAPIView(ConditionalRetrieveMixin, CommentModeMixin, generics.RetrieveUpdateDestroyAPIView):
+    queryset = Post.objects.select_related("author", "latest_comment").prefetch_related("tags").all()
     serializer_class = PostSerializer
     permission_classes = [IsOwnerOrReadOnly]
+    query_budget = {"get": 8}
     parser_classes = [JSONParser, FormParser, MultiPartParser]
 
 
-class PostListCreateMixins(mixins.ListModelMixin, mixins.CreateModelMixin, generics.GenericAPIView):
-    queryset = Post.objects.select_related("author").prefetch_related("tags", "comments").only("id", "title", "author", "created_at")
+class PostListCreateMixins(CommentModeMixin, mixins.ListModelMixin, mixins.CreateModelMixin, generics.GenericAPIView):
+    queryset = (
+        Post.objects.select_related("author", "latest_comment")
+        .prefetch_related("tags")
+        # content and image are serialized, deferring them cost a query per row
+        .only(
+            "id", "title", "content", "image", "image_variants", "author", "created_at", "comment_count", "like_count",
+            "latest_comment__content",
+        )
+    )
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     parser_classes = [JSONParser, FormParser, MultiPartParser]
     pagination_class = StandardResultsSetPagination
+    query_budget = {"get": 8}
 
     def get(self, request, *args, **kwargs):
         return self.list(request, *args, **kwargs)
@@ -54,29 +180,26 @@ class PostListCreateMixins(mixins.ListModelMixin, mixins.CreateModelMixin, gener
         return self.create(request, *args, **kwargs)
 
 
-@method_decorator(cache_page(60), name='dispatch')
-class PostListAPIView(generics.ListAPIView):
+class PostListAPIView(CachedListMixin, CommentModeMixin, generics.ListAPIView):
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    queryset = Post.objects.select_related("author").prefetch_related("tags", "comments")
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    queryset = Post.objects.select_related("author", "latest_comment").prefetch_related("tags")
+    filter_backends = [DjangoFilterBackend, PostSearchFilter, filters.OrderingFilter]
     filterset_fields = ["author__username", "tags__name"]
-    search_fields = ["title", "content", "author__username"]
     ordering_fields = ["created_at", "title"]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = PostSearchCursorPagination
     parser_classes = [JSONParser, FormParser, MultiPartParser]
+    query_budget = 7
+    # liked_by_me
+    cache_per_user = True
 
     def get_queryset(self):
-        latest_comment_subquery = Comment.objects.filter(post=OuterRef("pk")).order_by("-created_at").values("content")[:1]
-        return (
-            Post.objects.select_related("author")
-            .prefetch_related("tags", "comments__author")
+        # comment_count / like_count / latest_comment are maintained columns, no per-row aggregation here
+        queryset = (
+            Post.objects.select_related("author", "latest_comment")
+            .prefetch_related("tags")
             # .only("id", "title", "author", "created_at", "image")
             .annotate(
-                comment_count=Count("comments"),
-                tag_names=ArrayAgg("tags__name", distinct=True),
-                latest_comment=Subquery(latest_comment_subquery),
-                has_comments=Exists(Comment.objects.filter(post=OuterRef("pk"))),
                 has_image=Case(
                     When(image__isnull=False, then=Value(True)),
                     default=Value(False),
@@ -87,23 +210,24 @@ class PostListAPIView(generics.ListAPIView):
             )
             .order_by("-created_at")
         )
+        return self.with_comments(queryset)
 
 
-@method_decorator(cache_page(60), name='dispatch')
 class PostCreateAPIView(generics.CreateAPIView):
-    queryset = Post.objects.select_related("author").prefetch_related("tags", "comments").all()
+    queryset = Post.objects.select_related("author", "latest_comment").prefetch_related("tags", "comments").all()
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
 
-class PostRetrieveAPIView(generics.RetrieveAPIView):
-    queryset = Post.objects.select_related("author").prefetch_related("tags", "comments").all()
+class PostRetrieveAPIView(ConditionalRetrieveMixin, CommentModeMixin, generics.RetrieveAPIView):
+    queryset = Post.objects.select_related("author", "latest_comment").prefetch_related("tags").all()
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    query_budget = 8
 
 
-class PostUpdateAPIView(generics.UpdateAPIView):
-    queryset = Post.objects.select_related("author").prefetch_related("tags", "comments").all()
+class PostUpdateAPIView(CommentModeMixin, generics.UpdateAPIView):
+    queryset = Post.objects.select_related("author", "latest_comment").prefetch_related("tags").all()
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
@@ -118,19 +242,28 @@ class PostDeleteAPIView(generics.DestroyAPIView):
 
 
 @method_decorator(csrf_exempt, name="dispatch")
-class PostViewSet(viewsets.ModelViewSet):
-    queryset = Post.objects.select_related("author").prefetch_related("tags", "comments__author",).defer("content", "image").all()
+class PostViewSet(ImageUploadMixin, ConditionalRetrieveMixin, CachedListMixin, CommentModeMixin, viewsets.ModelViewSet):
+    queryset = Post.objects.select_related("author", "latest_comment").prefetch_related("tags").all()
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticated]
     parser_classes = [JSONParser, FormParser, MultiPartParser]
     throttle_classes = [TenPerHourUserThrottle]
-    pagination_class = StandardResultsSetPagination
+    pagination_class = PostCursorPagination
+    query_budget = {"list": 7, "retrieve": 8, "comments": 7, "like": 3, "unlike": 3}
+    # liked_by_me
+    cache_per_user = True
     filterset_fields = ["author__username", "tags__name"]
     filterset_class = PostFilter
     filter_backends = [DjangoFilterBackend]
     search_fields = ["title", "content", "author__username"]
     ordering_fields = ["created_at", "title"]
 
+    export_content_types = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+    image_upload_actions = ("upload_image",)
+    # levels of replies under each top-level comment of the comments action
+    comment_thread_depth = 5
+    max_comment_thread_depth = 20
+
     def get_queryset(self):
         queryset = super().get_queryset()
 
@@ -138,21 +271,56 @@ class PostViewSet(viewsets.ModelViewSet):
         queryset = (
             queryset
             .filter(author__is_active=True)
-            .select_related("author")
-            .prefetch_related("tags", "comments__author")
-            .defer("content", "image")
-            .order_by("-created_at")
+            .select_related("author", "latest_comment")
+            .prefetch_related("tags")
+            .order_by("-created_at", "-id")
         )
-    
-        limit = self.request.query_params.get("limit")
-        if limit:
-            try:
-                limit = int(limit)
-                queryset = queryset[:limit]
-            except ValueError:
-                pass  
         return queryset
 
+    @action(detail=False, methods=["post", "patch"], url_path="bulk", parser_classes=[JSONParser])
+    def bulk(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({"detail": "Expected a non-empty list of posts"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > max_bulk_items():
+            return Response(
+                {"detail": f"At most {max_bulk_items()} posts per request"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if request.method == "POST":
+            results = bulk_create_posts(items, request.user)
+        else:
+            results = bulk_update_posts(items, request.user)
+
+        failed = sum(result["status"] == "error" for result in results)
+        if failed == len(results):
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif failed:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED if request.method == "POST" else status.HTTP_200_OK
+        return Response({"results": results}, status=response_status)
+
+    @action(detail=False, methods=["get"])
+    def export(self, request):
+        """Every post matching the PostFilter params (``?type=posts``), or their comments (``?type=comments``),
+        streamed as ``?output=ndjson`` or ``csv`` instead of paged."""
+        export_type = request.query_params.get("type", "posts")
+        export_format = request.query_params.get("output", "ndjson")
+        if export_type not in EXPORT_TYPES or export_format not in EXPORT_FORMATS:
+            return Response(
+                {"detail": f"type must be one of {', '.join(EXPORT_TYPES)}, output one of {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        # ?format= is DRF's renderer override, hence ?output=
+        # the scope of get_queryset(), without the joins and prefetches a stream does not use
+        posts = DjangoFilterBackend().filter_queryset(request, Post.objects.filter(author__is_active=True), self)
+        response = StreamingHttpResponse(
+            export(export_type, export_format, posts), content_type=self.export_content_types[export_format]
+        )
+        response["Content-Disposition"] = f'attachment; filename="{export_type}.{export_format}"'
+        return response
+
     @action(detail=True, methods=["post"], parser_classes=[MultiPartParser, FormParser])
     def upload_image(self, request, pk=None):
         post = self.get_object()
@@ -160,27 +328,84 @@ class PostViewSet(viewsets.ModelViewSet):
         if not file_obj:
             return Response({"detail": "No file provided"}, status=status.HTTP_400_BAD_REQUEST)
 
-        post.image = file_obj
+        check_image(file_obj)
+        set_image(post, "image", file_obj)
         post.save()
         return Response(PostSerializer(post, context={"request": request}).data)
 
+    @action(detail=True, methods=["post"], throttle_classes=[LikeRateThrottle])
+    def like(self, request, pk=None):
+        """Idempotent; a single statement without loading the post, see blog.likes."""
+        return self.set_liked(request, pk, like_post)
+
+    @action(detail=True, methods=["post"], throttle_classes=[LikeRateThrottle])
+    def unlike(self, request, pk=None):
+        return self.set_liked(request, pk, unlike_post)
+
+    def set_liked(self, request, pk, change):
+        try:
+            post_id = int(pk)
+        except ValueError:
+            post_id = None
+        changed, like_count = change(post_id, request.user.pk) if post_id else (False, None)
+        if like_count is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        if changed:
+            invalidate(f"post:{post_id}")
+        return Response({"liked": change is like_post, "like_count": like_count})
+
+
+    def get_comment_thread_depth(self):
+        try:
+            depth = int(self.request.query_params.get("depth", self.comment_thread_depth))
+        except ValueError:
+            return self.comment_thread_depth
+        return max(0, min(depth, self.max_comment_thread_depth))
 
     @action(detail=True, methods=["get"])
     def comments(self, request, pk=None):
+        """A page of top-level comments, each with its replies nested ``?depth=`` levels deep."""
         post = self.get_object()
-        comments = (
-            Comment.objects.filter(post=post, parent__isnull=True)
-            .select_related("author")
-            .prefetch_related(Prefetch("replies", queryset=Comment.objects.select_related("author")))
-            .order_by("created_at")
-        )
-        serializer = CommentSerializer(comments, many=True, context={"request": request})
-        return Response(serializer.data)
+        comments = Comment.objects.filter(post=post, parent__isnull=True)
+        paginator = CommentThreadPagination()
+        paginator.max_depth = self.get_comment_thread_depth()
+        page = paginator.paginate_queryset(comments, request, view=self)
+        serializer = CommentThreadSerializer(page, many=True, context={"request": request})
+        return paginator.get_paginated_response(serializer.data)
 
 
-@method_decorator(cache_page(60), name='dispatch')
-class CachedPostListAPIView(generics.ListAPIView):
-    queryset = Post.objects.select_related("author").prefetch_related("tags").all()
+class CachedPostListAPIView(CachedListMixin, CommentModeMixin, generics.ListAPIView):
+    queryset = Post.objects.select_related("author", "latest_comment").prefetch_related("tags").all()
     serializer_class = PostSerializer
     parser_classes = [JSONParser, FormParser, MultiPartParser]
     permission_classes = [IsAuthenticatedOrReadOnly]
+    query_budget = 8
+    # liked_by_me
+    cache_per_user = True
+
+
+class FeedAPIView(CommentModeMixin, generics.ListAPIView):
+    """Posts of the authors and tags the user follows, newest first, from their precomputed timeline.
+
+    Posts are fanned out to the timelines when they are written, except those of popular
+    authors and tags, which each follower pulls in when reading (see blog.feed).
+    """
+    serializer_class = PostSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = FeedPagination
+    # a timeline has one order, (-created_at, -id), which FeedPagination keeps
+    filter_backends = []
+    query_budget = 9
+
+    def get_queryset(self):
+        return FeedEntry.objects.filter(user=self.request.user)
+
+    def list(self, request, *args, **kwargs):
+        pull_popular_posts(request.user)
+        entries = self.paginate_queryset(self.get_queryset())
+        posts = self.with_comments(
+            Post.objects.select_related("author", "latest_comment").prefetch_related("tags")
+        ).in_bulk([entry.post_id for entry in entries])
+        page = [posts[entry.post_id] for entry in entries if entry.post_id in posts]
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
@@ -10,30 +10,38 @@ from ..models import Tag, Post, Comment
 
 from ..serializers import TagSerializer, CommentSerializer
 
-from django.db.models import Prefetch
+from ..pagination import TagCommentCursorPagination
 
 
 
 class TagViewSet(viewsets.ModelViewSet):
-    queryset = (
-        Tag.objects.all()
-        .only("id", "name")
-        .prefetch_related(
-            Prefetch(
-                "posts",
-                queryset=Post.objects.only("id", "title").prefetch_related(
-                    Prefetch(
-                        "comments",
-                        queryset=Comment.objects.select_related("author").only(
-                            "id", "content", "author_id", "created_at").distinct()
-                    )
-                )
-            )
-        )
-    )
+    queryset = Tag.objects.only("id", "name", "post_count").order_by("name")
     serializer_class = TagSerializer
     permission_classes = [AllowAny]
+    query_budget = {"list": 5, "retrieve": 4, "comments": 5}
+
+    @action(detail=True, methods=["get"])
+    def comments(self, request, pk=None):
+        tag = self.get_object()
+        # single join through the post/tag table; a post carries a tag at most once, so no DISTINCT
+        comments = Comment.objects.filter(post__tags=tag, post__deleted_at__isnull=True).select_related("author")
+        paginator = TagCommentCursorPagination()
+        # no view: its ordering filter is for tags, the comments keep the paginator's order
+        page = paginator.paginate_queryset(comments, request)
+        serializer = CommentSerializer(page, many=True, context={"request": request})
+        return paginator.get_paginated_response(serializer.data)
+
 
+    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
+    def follow(self, request, pk=None):
+        """Put the tag's posts in the caller's feed (blog.feed); idempotent."""
+        self.get_object().followers.add(request.user)
+        return Response({"following": True})
+
+    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
+    def unfollow(self, request, pk=None):
+        self.get_object().followers.remove(request.user)
+        return Response({"following": False})
 
     @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
     def comment(self, request, pk=None):
@@ -1,4 +1,4 @@
-from .AnalyticsViews import AnalyticsAPIView
+from .AnalyticsViews import AnalyticsAPIView, AuthorAnalyticsAPIView, PostAnalyticsAPIView, TagAnalyticsAPIView
 from .CommentViews import CommentViewSet
 from .GeneralViews import api_status
 from .PostViews import (
@@ -11,5 +11,6 @@ from .PostViews import (
     PostDeleteAPIView,
     PostViewSet,
     CachedPostListAPIView,
+    FeedAPIView,
 )
 from .TagViews import TagViewSet
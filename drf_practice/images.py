@@ -0,0 +1,232 @@
+import hashlib
+import logging
+import os
+from io import BytesIO
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import FileUploadHandler, TemporaryFileUploadHandler
+from django.db import connection, transaction
+from django.dispatch import Signal
+
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException, ValidationError
+
+
+
+logger = logging.getLogger(__name__)
+
+# name -> bounding box; cropped variants are filled to exactly that size, the others fit inside it
+DEFAULT_IMAGE_VARIANTS = {
+    "thumbnail": {"size": (160, 160), "crop": True},
+    "card": {"size": (640, 360), "crop": True},
+    "full": {"size": (1600, 1600), "crop": False},
+}
+
+# sent with the {variant: name} a row got from generate_pending_variants(), which updates rows without saving them
+variants_rendered = Signal()
+
+# headers and form fields around the file in a multipart body
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def max_image_size():
+    return getattr(settings, "IMAGE_UPLOAD_MAX_SIZE", 2 * 1024 * 1024)
+
+
+def image_variants():
+    return getattr(settings, "IMAGE_VARIANTS", DEFAULT_IMAGE_VARIANTS)
+
+
+class ImageTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_code = "image_too_large"
+
+    def __init__(self):
+        super().__init__(f"Image size must be less than {max_image_size() // (1024 * 1024)} MB!")
+
+
+class ImageSizeLimitUploadHandler(FileUploadHandler):
+    """Rejects an upload from its Content-Length before the body is read, or at the first chunk past the limit.
+
+    Comes first in the handler chain, so nothing over the limit reaches disk.
+    """
+
+    def reject(self):
+        # later readers of request.POST (the debug toolbar) get an empty form instead of parsing again
+        self.request._mark_post_parse_error()
+        raise ImageTooLarge()
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length and content_length > max_image_size() + MULTIPART_OVERHEAD:
+            self.reject()
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        # clients that send no Content-Length, or a wrong one
+        self.received += len(raw_data)
+        if self.received > max_image_size():
+            self.reject()
+        return raw_data
+
+    def file_complete(self, file_size):
+        # the HashingTemporaryFileUploadHandler after this one builds the file
+        return None
+
+
+class HashingTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Hashes the upload while it streams to disk; the file gets a ``sha256`` hex digest for the storage."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file_obj = super().file_complete(file_size)
+        file_obj.sha256 = self.sha256.hexdigest()
+        return file_obj
+
+
+class ImageUploadMixin:
+    """Streams the uploads of ``image_upload_actions`` to a temporary file in 64 KB chunks, hashing them on the way.
+
+    The handlers have to be in place before anything reads the body, and the CSRF check of
+    session authentication already does, so they are set while the request is initialized.
+    """
+    image_upload_actions = ()
+
+    def initialize_request(self, request, *args, **kwargs):
+        drf_request = super().initialize_request(request, *args, **kwargs)
+        if getattr(self, "action", None) in self.image_upload_actions:
+            request.upload_handlers = [ImageSizeLimitUploadHandler(request), HashingTemporaryFileUploadHandler(request)]
+        return drf_request
+
+
+def check_image(file_obj):
+    """Validate an uploaded image from its header, without decoding the pixels."""
+    if file_obj.size > max_image_size():
+        raise ImageTooLarge()
+    try:
+        with Image.open(file_obj) as image:
+            width, height = image.size
+    except (UnidentifiedImageError, OSError):
+        raise ValidationError({"detail": "Upload a valid image."})
+    finally:
+        file_obj.seek(0)
+    if width * height > getattr(settings, "IMAGE_MAX_PIXELS", 40_000_000):
+        raise ValidationError({"detail": "Image dimensions are too large."})
+
+
+class StoredFilesModelMixin:
+    """For models with ``stored_file_fields``: saves in a transaction, so that blog.signals can lock
+    the row while it reads the blobs the save replaces."""
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
+
+def set_image(instance, field_name, file_obj):
+    """Assign a new image and queue its variants; the old files go once nothing references them (blog.storage)."""
+    setattr(instance, field_name, file_obj)
+    setattr(instance, f"{field_name}_variants", None)
+
+
+def render_variants(field_file):
+    """Save every image_variants() rendition of ``field_file`` to its storage, returns ``{variant: name}``."""
+    storage = field_file.storage
+    stem = os.path.splitext(field_file.name)[0]
+    image_format = getattr(settings, "IMAGE_VARIANT_FORMAT", "WEBP")
+    quality = getattr(settings, "IMAGE_VARIANT_QUALITY", 80)
+    variants = sorted(image_variants().items(), key=lambda item: -item[1]["size"][0] * item[1]["size"][1])
+
+    names = {}
+    with field_file.open("rb"), Image.open(field_file) as original:
+        # JPEG decoding can skip straight to the largest size needed
+        original.draft("RGB", variants[0][1]["size"])
+        image = ImageOps.exif_transpose(original).convert("RGB")
+        for name, spec in variants:
+            if spec["crop"]:
+                rendition = ImageOps.fit(image, spec["size"], Image.Resampling.LANCZOS)
+            else:
+                rendition = image.copy()
+                rendition.thumbnail(spec["size"], Image.Resampling.LANCZOS, reducing_gap=3.0)
+            buffer = BytesIO()
+            rendition.save(buffer, image_format, quality=quality)
+            names[name] = storage.save(f"{stem}_{name}.{image_format.lower()}", ContentFile(buffer.getvalue()))
+    return names
+
+
+def _variant_lock_key(model, field_name, pk):
+    return f"{model._meta.label}.{field_name}:{pk}"
+
+
+def generate_pending_variants(model, field_name, batch_size=None):
+    """Render the variants of up to ``batch_size`` rows whose ``<field>_variants`` is NULL, i.e. queued.
+
+    Each row is claimed with a session advisory lock, not a row lock, so the counter updates the
+    row gets meanwhile do not wait for Pillow; rows another worker holds are skipped. The variants
+    are written only if the row still has the image they were rendered from and is still queued,
+    so a re-upload during rendering is not overwritten. An unreadable image gets no variants
+    rather than being retried forever. Returns the primary keys of the rows done.
+    """
+    variants_field = f"{field_name}_variants"
+    batch_size = batch_size or getattr(settings, "IMAGE_VARIANT_BATCH_SIZE", 20)
+    queued = (
+        model._base_manager.filter(**{f"{variants_field}__isnull": True, f"{field_name}__isnull": False})
+        .exclude(**{field_name: ""})
+        .only("pk", field_name)
+    )
+    done = []
+    for instance in queued[:batch_size]:
+        key = _variant_lock_key(model, field_name, instance.pk)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", [key])
+            if not cursor.fetchone()[0]:
+                continue
+        try:
+            field_file = getattr(instance, field_name)
+            try:
+                names = render_variants(field_file)
+            except (OSError, ValueError, Image.DecompressionBombError):
+                logger.exception("Cannot render variants of %s %s", model._meta.label, instance.pk)
+                names = {}
+            with transaction.atomic():
+                updated = model._base_manager.filter(
+                    pk=instance.pk, **{field_name: field_file.name, f"{variants_field}__isnull": True}
+                ).update(**{variants_field: names})
+                # renditions of a replaced image reference nothing, collect_garbage() removes them
+                if updated:
+                    variants_rendered.send(sender=model, pk=instance.pk, names=names)
+                    done.append(instance.pk)
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", [key])
+    return done
+
+
+class ImageVariantsField(serializers.Field):
+    """``{variant: url}`` of the rendered variants, ``null`` until they exist; use the original meanwhile."""
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, names):
+        if not names:
+            return None
+        request = self.context.get("request")
+        urls = {name: default_storage.url(path) for name, path in names.items()}
+        if request is not None:
+            urls = {name: request.build_absolute_uri(url) for name, url in urls.items()}
+        return urls
@@ -0,0 +1,167 @@
+import functools
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from rest_framework.response import Response
+from rest_framework.serializers import BaseSerializer
+from rest_framework.views import APIView
+
+
+
+_local = threading.local()
+
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+
+_NOT_COLLECTING = nullcontext()
+
+
+class _Span:
+    # a plain class rather than @contextmanager: spans wrap every query, the generator costs add up
+    __slots__ = ("timings", "name", "start")
+
+    def __init__(self, timings, name):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        # re-entrant: a span nested in one of the same name is only counted once
+        self.timings._open[self.name] += 1
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        open_spans = self.timings._open
+        open_spans[self.name] -= 1
+        if not open_spans[self.name]:
+            self.timings.spans[self.name] += time.perf_counter() - self.start
+
+
+class Timings:
+    """Seconds spent per named phase of one request, plus event counters such as ``queries``.
+
+    With ``track_shapes`` every query is also counted by its shape, see query_shape().
+    """
+
+    def __init__(self, track_shapes=False):
+        self.spans = defaultdict(float)
+        self.counts = defaultdict(int)
+        self.shapes = Counter()
+        self.track_shapes = track_shapes
+        self._open = defaultdict(int)
+
+    def span(self, name):
+        return _Span(self, name)
+
+
+def current():
+    return getattr(_local, "timings", None)
+
+
+@contextmanager
+def collect(track_shapes=False):
+    """Record the spans of the code run inside the block on this thread.
+
+    Nested blocks share the outer collection, so middlewares and the benchmark see the same numbers.
+    """
+    previous = current()
+    if previous is not None:
+        previous.track_shapes |= track_shapes
+        yield previous
+        return
+    timings = _local.timings = Timings(track_shapes)
+    try:
+        yield timings
+    finally:
+        _local.timings = previous
+
+
+def span(name):
+    timings = current()
+    return _Span(timings, name) if timings is not None else _NOT_COLLECTING
+
+
+def query_shape(sql):
+    """The SQL with whitespace collapsed and ``IN (%s, %s, ...)`` lists folded, params are already out."""
+    return _IN_LIST.sub("IN (...)", " ".join(sql.split()))
+
+
+def _time_query(execute, sql, params, many, context):
+    timings = current()
+    if timings is None:
+        return execute(sql, params, many, context)
+    timings.counts["queries"] += 1
+    if timings.track_shapes:
+        timings.shapes[query_shape(sql)] += 1
+    with _Span(timings, "db"):
+        return execute(sql, params, many, context)
+
+
+def _add_query_timer(connection, **kwargs):
+    # first, not last: connection.execute_wrapper() blocks pop() the last wrapper on exit
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _time_query)
+
+
+def instrument_database():
+    """Count queries and time them as ``db`` while a collection is active, on every connection.
+
+    The wrapper stays installed and costs one thread-local lookup per query outside of collect().
+    """
+    if getattr(_add_query_timer, "installed", False):
+        return
+    connection_created.connect(_add_query_timer, dispatch_uid="drf_practice.instrumentation")
+    # connection objects that already exist in this thread; new ones get it on connect
+    for connection in connections.all(initialized_only=True):
+        _add_query_timer(connection)
+    _add_query_timer.installed = True
+
+
+def instrument_serializers():
+    """Time ``serializer.data`` (``to_representation`` of the outermost serializer) as ``serialize``.
+
+    Lazy loads triggered while serializing, e.g. N+1 queries, are counted in the span too.
+    """
+    if getattr(BaseSerializer, "_instrumented", False):
+        return
+    original = BaseSerializer.data.fget
+
+    def data(self):
+        with span("serialize"):
+            return original(self)
+
+    BaseSerializer.data = property(data)
+    BaseSerializer._instrumented = True
+
+
+def _timed_method(cls, name, span_name):
+    method = getattr(cls, name)
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        with span(span_name):
+            return method(*args, **kwargs)
+
+    setattr(cls, name, wrapper)
+
+
+def instrument_views():
+    """Time DRF authentication, permission checks and response rendering as ``auth``, ``permissions`` and ``render``."""
+    if getattr(APIView, "_instrumented", False):
+        return
+    # request.user is resolved lazily, perform_authentication() is where it is forced
+    _timed_method(APIView, "perform_authentication", "auth")
+    _timed_method(APIView, "check_permissions", "permissions")
+    _timed_method(APIView, "check_object_permissions", "permissions")
+    original = Response.rendered_content.fget
+
+    def rendered_content(self):
+        with span("render"):
+            return original(self)
+
+    Response.rendered_content = property(rendered_content)
+    APIView._instrumented = True
@@ -0,0 +1,162 @@
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+
+from .instrumentation import collect, instrument_database, instrument_serializers, instrument_views
+
+
+
+logger = logging.getLogger(__name__)
+timing_logger = logging.getLogger("drf_practice.timing")
+
+# transaction control, e.g. the savepoints around DatabaseCache writes, is not data access
+TRANSACTION_CONTROL = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+
+class QueryInspectionError(AssertionError):
+    """A request went over its view's query budget or repeated one query shape N+1 style."""
+
+
+def view_class(view_func):
+    # set by APIView.as_view() and ViewSetMixin.as_view()
+    return getattr(view_func, "cls", None)
+
+
+def get_query_budget(view_func, request):
+    """The ``query_budget`` of the view class: an int, or a dict keyed by viewset action or HTTP method."""
+    budget = getattr(view_class(view_func), "query_budget", None)
+    if isinstance(budget, dict):
+        method = request.method.lower()
+        budget = budget.get((getattr(view_func, "actions", None) or {}).get(method, method))
+    return budget
+
+
+def ignored_tables():
+    # the database cache backend's own bookkeeping is not an access pattern of the view
+    tables = getattr(settings, "QUERY_INSPECTOR_IGNORE_TABLES", None)
+    if tables is None:
+        tables = [
+            config["LOCATION"] for config in settings.CACHES.values()
+            if config["BACKEND"].endswith("DatabaseCache")
+        ]
+    return [f'"{table}"' for table in tables]
+
+
+class QueryInspectorMiddleware:
+    """Counts each request's queries by shape, enforcing view query budgets and flagging N+1 patterns.
+
+    A view declares ``query_budget``, counting every query of the request including the session and
+    user lookups of authentication (two queries) and the throttle bucket (one); a request running
+    more queries, or the same query shape
+    QUERY_N_PLUS_ONE_THRESHOLD times or more, is a violation. Violations raise
+    QueryInspectionError when QUERY_INSPECTOR_RAISE is set (the test suite) and are logged otherwise.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "QUERY_INSPECTOR_ENABLED", True)
+        self.ignored = ignored_tables()
+        if self.enabled:
+            instrument_database()
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+        with collect(track_shapes=True) as timings:
+            response = self.get_response(request)
+        self.inspect(request, timings)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(view_func, request)
+        request.query_view = (view_class(view_func) or view_func).__name__
+
+    def inspect(self, request, timings):
+        shapes = {
+            shape: count for shape, count in timings.shapes.items()
+            if not shape.startswith(TRANSACTION_CONTROL) and not any(table in shape for table in self.ignored)
+        }
+        view = getattr(request, "query_view", None)
+        problems = []
+
+        budget = getattr(request, "query_budget", None)
+        total = sum(shapes.values())
+        if budget is not None and total > budget:
+            problems.append(f"ran {total} queries, budget is {budget}")
+
+        threshold = getattr(settings, "QUERY_N_PLUS_ONE_THRESHOLD", 5)
+        for shape, count in shapes.items():
+            if count >= threshold:
+                problems.append(f"N+1: {count} x {shape[:200]}")
+
+        if not problems:
+            return
+        message = f"{request.method} {request.path} ({view}): " + "; ".join(problems)
+        if getattr(settings, "QUERY_INSPECTOR_RAISE", False):
+            raise QueryInspectionError(message)
+        logger.warning(message)
+
+
+class ServerTimingMiddleware:
+    """Splits a request's time into auth, permissions, db, serialize and render.
+
+    The breakdown goes out as a ``Server-Timing`` header on views of SERVER_TIMING_APPS, and a
+    SERVER_TIMING_LOG_SAMPLE_RATE share of those requests is also logged as one JSON line on the
+    ``drf_practice.timing`` logger. The spans are a few perf_counter() calls per phase and per
+    query, cheap enough to stay on in production.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, "SERVER_TIMING_ENABLED", True)
+        self.apps = tuple(getattr(settings, "SERVER_TIMING_APPS", ("blog", "users")))
+        self.sample_rate = getattr(settings, "SERVER_TIMING_LOG_SAMPLE_RATE", 0.01)
+        if self.enabled:
+            instrument_database()
+            instrument_serializers()
+            instrument_views()
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+        start = time.perf_counter()
+        with collect() as timings:
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        view = getattr(request, "timing_view", None)
+        if view is not None:
+            response["Server-Timing"] = self.header(timings, total)
+            if self.sample_rate and random.random() < self.sample_rate:
+                self.log(request, response, view, timings, total)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        cls = view_class(view_func)
+        module = (cls or view_func).__module__
+        if module.split(".", 1)[0] in self.apps:
+            request.timing_view = f"{module}.{(cls or view_func).__name__}"
+
+    def header(self, timings, total):
+        metrics = [
+            f"{name};dur={timings.spans[name] * 1000:.2f}"
+            for name in ("auth", "permissions", "serialize", "render")
+        ]
+        metrics.append(f'db;dur={timings.spans["db"] * 1000:.2f};desc="{timings.counts["queries"]} queries"')
+        metrics.append(f"total;dur={total * 1000:.2f}")
+        return ", ".join(metrics)
+
+    def log(self, request, response, view, timings, total):
+        timing_logger.info(json.dumps({
+            "method": request.method,
+            "path": request.path,
+            "view": view,
+            "status": response.status_code,
+            "total_ms": round(total * 1000, 2),
+            "queries": timings.counts["queries"],
+            **{f"{name}_ms": round(timings.spans[name] * 1000, 2)
+               for name in ("auth", "permissions", "db", "serialize", "render")},
+        }))
@@ -0,0 +1,69 @@
+import datetime
+import decimal
+
+import orjson
+
+from django.db.models.query import QuerySet
+from django.utils.functional import Promise
+
+from rest_framework.renderers import BaseRenderer
+
+
+
+def _default(obj):
+    # what orjson does not serialize on its own, converted like rest_framework.utils.encoders.JSONEncoder
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, decimal.Decimal):
+        # DecimalField already renders strings under COERCE_DECIMAL_TO_STRING
+        return float(obj)
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, QuerySet):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, "__iter__"):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class ORJSONRenderer(BaseRenderer):
+    """JSONRenderer on orjson, several times faster on large nested payloads such as post pages.
+
+    Datetimes, dates, UUIDs and the ReturnDict / ReturnList of serializers are encoded natively,
+    Decimals and lazy translation strings go through _default(). Output is compact UTF-8 unless
+    the client asks for ``indent`` in the Accept header, which orjson only supports as 2 spaces.
+    U+2028 / U+2029 are escaped as JSONRenderer does; large and small floats keep orjson's
+    notation (``1e16`` rather than ``1e+16``), the same number but not the same bytes.
+    """
+    media_type = "application/json"
+    format = "json"
+    charset = None
+    options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def get_indent(self, accepted_media_type, renderer_context):
+        if accepted_media_type:
+            params = dict(
+                param.strip().split("=", 1)
+                for param in accepted_media_type.split(";")[1:]
+                if "=" in param
+            )
+            try:
+                return max(min(int(params.get("indent", 0)), 8), 0)
+            except ValueError:
+                pass
+        return renderer_context.get("indent") or 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        options = self.options
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            options |= orjson.OPT_INDENT_2
+        # U+2028 / U+2029 are valid in JSON strings but not in JavaScript ones, JSONRenderer escapes them
+        return (
+            orjson.dumps(data, default=_default, option=options)
+            .replace(b"\xe2\x80\xa8", b"\\u2028")
+            .replace(b"\xe2\x80\xa9", b"\\u2029")
+        )
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -25,6 +26,8 @@ SECRET_KEY = 'django-insecure-yiw&w_*gf(^+4$$u7a6v!ucm2smv+t=7b72j3*5gcy-nk1^=k0
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
+TESTING = len(sys.argv) > 1 and sys.argv[1] == "test"
+
 ALLOWED_HOSTS = []
 
 
@@ -49,6 +52,8 @@ INSTALLED_APPS = [
     ]
 
 MIDDLEWARE = [
+    "drf_practice.middleware.ServerTimingMiddleware",
+    "drf_practice.middleware.QueryInspectorMiddleware",
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -152,9 +157,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 
 REST_FRAMEWORK = {
+    # orjson in production, the browsable API only while developing
     "DEFAULT_RENDERER_CLASSES": (
-        "rest_framework.renderers.JSONRenderer",
-        "rest_framework.renderers.BrowsableAPIRenderer",  
+        "drf_practice.renderers.ORJSONRenderer",
+        *(("rest_framework.renderers.BrowsableAPIRenderer",) if DEBUG and not TESTING else ()),
     ),
     "DEFAULT_PARSER_CLASSES": (
         "rest_framework.parsers.JSONParser",
@@ -173,14 +179,16 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.AllowAny",
 
     ),
+    # token buckets in the database, shared by every worker (blog.throttling)
     "DEFAULT_THROTTLE_CLASSES": (
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "blog.throttling.SharedAnonRateThrottle",
+        "blog.throttling.SharedUserRateThrottle",
     ),
     "DEFAULT_THROTTLE_RATES": {
         "anon": "20/minute",
         "user": "1000/day",   
         "ten_per_hour": "10/hour",
+        "likes": "600/hour",
     },
     "DEFAULT_FILTER_BACKENDS": (
         "django_filters.rest_framework.DjangoFilterBackend",
@@ -199,17 +207,97 @@ REST_FRAMEWORK = {
 }
 
 
+# text search configuration used for Post.search_vector and ?search= queries
+POST_SEARCH_CONFIG = "english"
+
+
+# per-request query inspection (drf_practice.middleware): views declare query_budget,
+# repeated query shapes are reported as N+1; the test suite fails on both
+QUERY_INSPECTOR_ENABLED = True
+QUERY_INSPECTOR_RAISE = TESTING
+QUERY_N_PLUS_ONE_THRESHOLD = 5
+
+
+# Server-Timing breakdown on blog and users views (drf_practice.middleware), a sample is logged
+SERVER_TIMING_ENABLED = True
+SERVER_TIMING_APPS = ("blog", "users")
+SERVER_TIMING_LOG_SAMPLE_RATE = 0.01
+
+
+# posts per transaction when seeding data (create_posts, see blog.seeding)
+SEED_CHUNK_SIZE = 5000
+
+
+# largest batch accepted by POST/PATCH /api/blog/posts/bulk
+POST_BULK_MAX_ITEMS = 1000
+
+
+# rows per server-side cursor fetch of /api/blog/posts/export and export_posts (blog.export)
+EXPORT_CHUNK_SIZE = 2000
+
+
+# soft-deleted posts are hard-deleted this long after deletion, in batches (blog.purge)
+POST_PURGE_RETENTION_DAYS = 30
+POST_PURGE_BATCH_SIZE = 100
+POST_PURGE_COMMENT_BATCH_SIZE = 5000
+
+
+# scheduled jobs run in `manage.py run_jobs` (blog.scheduler), keeping their JobRun history this long
+JOB_RUN_RETENTION_DAYS = 14
+# throttle buckets unchecked this many seconds are dropped by the purge_throttle_buckets job
+THROTTLE_BUCKET_MAX_IDLE = 24 * 3600
+
+# blog.feed: posts of authors/tags with more followers are pulled by each reader instead of pushed to every timeline
+FEED_FANOUT_MAX_FOLLOWERS = 5000
+# timeline entries older than this are pruned; follow backfills reach back as far
+FEED_RETENTION_DAYS = 30
+
+
+# analytics sections embed at most this many titles / comment texts per row (?array_cap= up to the max)
+ANALYTICS_ARRAY_CAP = 10
+ANALYTICS_MAX_ARRAY_CAP = 100
+
+
 CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         "LOCATION": "unique-snowflake",
-    }
+    },
+    # shared by every worker; create the table with `python manage.py createcachetable`
+    "responses": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "response_cache",
+        "OPTIONS": {"MAX_ENTRIES": 50000},
+    },
 }
 
+# blog.cache.CachedListMixin: entries are invalidated by model signals, the timeout is only a backstop
+RESPONSE_CACHE_ALIAS = "responses"
+RESPONSE_CACHE_TIMEOUT = 300
+
 
 MEDIA_ROOT = r"C:\Users\Nidhi Panchal\media_files"
 MEDIA_URL = "/media/"
 
+# uploads are stored once per content under blobs/<sha256> and reference-counted (blog.storage)
+STORAGES = {
+    "default": {"BACKEND": "blog.storage.ContentAddressedStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+# unreferenced blobs are kept this long before the collect_media_blobs job deletes them
+MEDIA_BLOB_GRACE_HOURS = 24
+
+# uploads to the upload_image / upload_profile_image actions stream to disk and stop at this size
+IMAGE_UPLOAD_MAX_SIZE = 2 * 1024 * 1024
+# resized copies rendered by the generate_image_variants job (drf_practice.images)
+IMAGE_VARIANTS = {
+    "thumbnail": {"size": (160, 160), "crop": True},
+    "card": {"size": (640, 360), "crop": True},
+    "full": {"size": (1600, 1600), "crop": False},
+}
+IMAGE_VARIANT_FORMAT = "WEBP"
+IMAGE_VARIANT_QUALITY = 80
+
 
 AUTH_USER_MODEL = "users.User"
 
@@ -228,6 +316,13 @@ EMAIL_HOST_USER = 'needhi1312@gmail.com'
 EMAIL_HOST_PASSWORD = 'jxxa ysid lswf dxnf'  
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# comment notifications go through blog.outbox; run `manage.py send_outbox_emails` to deliver them
+EMAIL_OUTBOX_BATCH_SIZE = 100
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_BACKOFF = 30  # seconds, doubled after every failed attempt
+EMAIL_OUTBOX_MAX_BACKOFF = 3600
+EMAIL_OUTBOX_LEASE = 300  # seconds a claimed batch is reserved for its worker
+
 
 APPEND_SLASH = False
 
@@ -26,6 +26,8 @@ from rest_framework import permissions
 from django.conf import settings
 from django.conf.urls.static import static
 
+from blog.storage import serve_media
+
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
@@ -56,7 +58,8 @@ urlpatterns = [
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # blobs are served immutable, see blog.storage
+    urlpatterns += static(settings.MEDIA_URL, view=serve_media, document_root=settings.MEDIA_ROOT)
 
 
 if settings.DEBUG:
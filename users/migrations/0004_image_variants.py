@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:39
+
+from django.db import migrations, models
+
+
+def queue_existing_images(apps, schema_editor):
+    User = apps.get_model("users", "User")
+    User._base_manager.exclude(profile_image__in=["", "profiles/default.png"]).exclude(profile_image=None).update(
+        profile_image_variants=None
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0003_alter_user_managers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='profile_image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, null=True),
+        ),
+        migrations.RunPython(queue_existing_images, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('profile_image_variants__isnull', True)), fields=['id'], name='users_user_variants_queue_idx'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.contrib.auth.models import AbstractUser,BaseUserManager
 from django.db import models
 
+from drf_practice.images import StoredFilesModelMixin
+
 
 
 class UserManager(BaseUserManager):
@@ -34,7 +36,7 @@ class UserManager(BaseUserManager):
     
 
 
-class User(AbstractUser):
+class User(StoredFilesModelMixin, AbstractUser):
     ROLE_ADMIN = "admin"
     ROLE_AUTHOR = "author"
     ROLE_MODERATOR = "moderator"
@@ -52,15 +54,32 @@ class User(AbstractUser):
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default=ROLE_CUSTOMER)
     bio = models.TextField(blank=True, null=True)
     profile_image = models.ImageField(upload_to="profiles/", blank=True, null=True, default="profiles/default.png")
+    # {variant: storage name} of the resized copies, NULL while queued (see drf_practice.images)
+    profile_image_variants = models.JSONField(default=dict, null=True, blank=True, editable=False)
     phone_number = models.CharField(max_length=15, blank=True, null=True)
     gender = models.CharField(max_length=10, choices=[("male","Male"),("female","Female")], blank=True, null=True)
     date_of_birth = models.DateField(blank=True, null=True)
     is_verified = models.BooleanField(default=False)
+    # authors whose posts reach this user's feed (see blog.feed)
+    following = models.ManyToManyField("self", symmetrical=False, related_name="followers", blank=True)
+    # when the feed last pulled in popular authors and tags, NULL before the first read
+    feed_pulled_at = models.DateTimeField(null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # file fields whose blobs blog.signals reference-counts (see blog.storage)
+    stored_file_fields = ("profile_image",)
+
     objects = UserManager()
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # profile images waiting for their variants
+            models.Index(
+                fields=["id"], condition=models.Q(profile_image_variants__isnull=True), name="users_user_variants_queue_idx"
+            ),
+        ]
+
     def __str__(self):
         return self.username
     
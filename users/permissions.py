@@ -22,7 +22,7 @@ class IsOwnerOrAdmin(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         if request.user and request.user.is_authenticated and (request.user.is_admin or request.user.is_superuser):
             return True
-        owner = getattr(obj, "author", None) or getattr(obj, "user", None)
-        if owner is None:
+        owner_id = getattr(obj, "author_id", None) or getattr(obj, "user_id", None)
+        if owner_id is None:
             return False
-        return owner == request.user
+        return owner_id == request.user.pk
@@ -4,17 +4,20 @@ from ..models import User
 
 from django.contrib.auth import get_user_model
 
+from drf_practice.images import ImageVariantsField, set_image
+
 User = get_user_model()
 
 
 
 class UserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=False, style={'input_type': 'password'})
+    profile_image_variants = ImageVariantsField()
     
     class Meta:
         model = User
         fields = [
-            "id", "username", "email", "first_name", "last_name", "bio", "profile_image", "phone_number", "gender", "date_of_birth",
+            "id", "username", "email", "first_name", "last_name", "bio", "profile_image", "profile_image_variants", "phone_number", "gender", "date_of_birth",
             "is_verified", "is_staff", "is_active", "created_at", "updated_at","password",
         ]
         read_only_fields = ["is_staff", "is_active", "created_at", "updated_at"]
@@ -23,6 +26,8 @@ class UserSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         password = validated_data.pop("password", None) 
+        if validated_data.get("profile_image"):
+            validated_data["profile_image_variants"] = None
         user = User(**validated_data)
         if password:  
             user.set_password(password)
@@ -33,6 +38,8 @@ class UserSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         password = validated_data.pop("password", None)
+        if "profile_image" in validated_data:
+            set_image(instance, "profile_image", validated_data.pop("profile_image"))
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         if password:
@@ -9,14 +9,18 @@ from ..serializers.UserSerializers import UserSerializer
 
 from django_filters.rest_framework import DjangoFilterBackend
 
+from drf_practice.images import ImageUploadMixin, check_image, set_image
 
 
-class UserViewSet(viewsets.ModelViewSet):
+
+class UserViewSet(ImageUploadMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = {"list": 5, "retrieve": 4}
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['is_active']
+    image_upload_actions = ("upload_profile_image",)
 
     @action(detail=True, methods=["post"])
     def soft_delete(self, request, pk=None):
@@ -31,10 +35,25 @@ class UserViewSet(viewsets.ModelViewSet):
         file_obj = request.FILES.get("profile_image")
         if not file_obj:
             return Response({"detail": "No file provided"}, status=status.HTTP_400_BAD_REQUEST)
-        user.profile_image = file_obj
+        check_image(file_obj)
+        set_image(user, "profile_image", file_obj)
         user.save()
         return Response(UserSerializer(user, context={"request": request}).data)
 
+    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
+    def follow(self, request, pk=None):
+        """Put the user's posts in the caller's feed (blog.feed); idempotent."""
+        author = self.get_object()
+        if author.pk == request.user.pk:
+            return Response({"detail": "You cannot follow yourself"}, status=status.HTTP_400_BAD_REQUEST)
+        request.user.following.add(author)
+        return Response({"following": True})
+
+    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
+    def unfollow(self, request, pk=None):
+        request.user.following.remove(self.get_object())
+        return Response({"following": False})
+
 
     from rest_framework import permissions
     class IsAuthorOrAdmin(permissions.BasePermission):